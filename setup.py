@@ -15,7 +15,7 @@ setuptools.setup(
         'knockpy>=1.2',
         'pandas>=1.4.2',
         'numpy>=1.23.1',
-        'joblib>=1.1.0',
+        'joblib>=1.4.0',
         'tqdm>=4.64.0',
         'seaborn>=0.12.0',
         'matplotlib>=3.5.2'
@@ -1 +1,13 @@
+import os
+import warnings
 
+# Optional Intel(R) Extension for Scikit-learn, enabled with STABL_PATCH_SKLEARN=1. The patch has to be applied
+# before the scikit-learn estimators are imported by the submodules.
+if os.environ.get("STABL_PATCH_SKLEARN", "0") == "1":
+    try:
+        from sklearnex import patch_sklearn
+    except ImportError:
+        warnings.warn("STABL_PATCH_SKLEARN is set but scikit-learn-intelex is not installed, "
+                      "the standard scikit-learn estimators are used.")
+    else:
+        patch_sklearn()
@@ -46,11 +46,24 @@ def jaccard_matrix(list_of_lists, remove_diag=True):
     """
 
     N = len(list_of_lists)
-    jaccard_mat = np.zeros((N, N))
 
-    for i in range(N):
-        for j in range(N):
-            jaccard_mat[i, j] = jaccard_similarity(list_of_lists[i], list_of_lists[j])
+    # Membership matrix of the lists over all their elements: the sizes of all the pairwise intersections are
+    # then given by a single matrix product instead of N² set intersections
+    vocabulary = dict()
+    rows, cols = [], []
+    for i, elements in enumerate(list_of_lists):
+        for element in set(elements):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(element, len(vocabulary)))
+    membership = np.zeros((N, len(vocabulary)), dtype=np.float32)
+    membership[rows, cols] = 1
+
+    intersection = (membership @ membership.T).astype(np.float64)
+    sizes = np.array([len(elements) for elements in list_of_lists], dtype=np.float64)
+    union = sizes[:, None] + sizes[None, :] - intersection
+
+    jaccard_mat = np.zeros((N, N))
+    np.divide(intersection, union, out=jaccard_mat, where=union != 0)
 
     if remove_diag:
         jaccard_mat = jaccard_mat[~np.eye(jaccard_mat.shape[0], dtype=bool)].reshape(jaccard_mat.shape[0], -1)
@@ -1,26 +1,34 @@
 import pandas as pd
 import numpy as np
+import collections
+import contextlib
+import functools
+import importlib.util
+import itertools
 import os
+import shutil
 from pathlib import Path
+from joblib import Parallel, delayed, parallel_backend, effective_n_jobs
 from sklearn import clone
+from threadpoolctl import threadpool_limits
+from sklearn.base import BaseEstimator
 
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression, LogisticRegressionCV, LinearRegression, LassoCV
+from sklearn.linear_model import LogisticRegression, LinearRegression
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.feature_selection import VarianceThreshold
-from sklearn.model_selection import RepeatedKFold, RepeatedStratifiedKFold, LeaveOneOut
+from sklearn.feature_selection import VarianceThreshold, SelectorMixin
+from sklearn.model_selection import RepeatedKFold, RepeatedStratifiedKFold
 from sklearn.svm import l1_min_c
 
 from sklearn.utils.validation import check_is_fitted
 from sklearn.linear_model import Lasso
 from sklearn.model_selection import GroupShuffleSplit
 from sklearn.metrics import roc_auc_score, average_precision_score, r2_score, mean_squared_error, mean_absolute_error
+from scipy.special import expit
 from scipy.stats import mannwhitneyu
 
 from .stabl import Stabl, plot_stabl_path, plot_fdr_graph, save_stabl_results
 from .pipelines_utils import compute_scores_table, save_plots, compute_scores_table_multiomic
-from .preprocessing import remove_low_info_samples, LowInfoFilter
+from .preprocessing import remove_low_info_samples, LowInfoFilter, MedianImputeScaler
 from .utils import compute_CI, permutation_test_between_clfs
 from .metrics import jaccard_matrix
 
@@ -28,25 +36,950 @@ from .stacked_generalization import stacked_multi_omic
 import random
 
 
-lasso_cv = LassoCV(n_alphas=50, max_iter=int(1e6), n_jobs=-1)
-logit_lasso_cv = LogisticRegressionCV(penalty="l1", solver="liblinear", Cs=np.logspace(-2, 2, 50),
-                                      max_iter=int(1e6), class_weight="balanced", scoring="roc_auc",
-                                      n_jobs=-1
-                                      )
-
 logit = LogisticRegression(penalty=None, class_weight="balanced", max_iter=int(1e6))
 linreg = LinearRegression()
 
+# Base models of the early fusion Lasso, see `_path_lasso_cv`
+logit_lasso = LogisticRegression(penalty="l1", solver="liblinear", class_weight="balanced", max_iter=int(1e6))
+lasso = Lasso(max_iter=int(1e6))
+
 preprocessing = Pipeline(
     steps=[
         ("variance", VarianceThreshold(0.0)),
         ("lif", LowInfoFilter()),
-        ("impute", SimpleImputer(strategy="median")),
-        ("std", StandardScaler())
+        ("impute_std", MedianImputeScaler(copy=False))
     ]
 )
 
 
+def _predict_positive_proba(model, X):
+    """Predicted probability of the positive class, computed from the decision function of the binary logistic
+    model instead of building the (n_samples, 2) array of predict_proba."""
+    return expit(model.decision_function(X))
+
+
+def _predict_values(model, X):
+    """Predicted values of a regression model."""
+    return model.predict(X)
+
+
+def _half(y_train):
+    """Prediction of a binary model without any feature."""
+    return 0.5
+
+
+def _decision_roc_auc(model, X, y):
+    """ROC AUC of the decision function of a binary model."""
+    return roc_auc_score(y, model.decision_function(X))
+
+
+def _neg_mse(model, X, y):
+    """Negative mean squared error of a regression model."""
+    return -mean_squared_error(y, model.predict(X))
+
+
+# Models and functions depending on the task type, resolved once with `_task_callables`
+_Task = collections.namedtuple(
+    "_Task", ["final_model", "inner_splitter", "predict", "default_prediction", "path_score"]
+)
+_TASKS = {
+    "binary": _Task(
+        final_model=logit,
+        inner_splitter=RepeatedStratifiedKFold,
+        predict=_predict_positive_proba,
+        default_prediction=_half,
+        path_score=_decision_roc_auc
+    ),
+    "regression": _Task(
+        final_model=linreg,
+        inner_splitter=RepeatedKFold,
+        predict=_predict_values,
+        default_prediction=np.mean,
+        path_score=_neg_mse
+    )
+}
+
+
+def _task_callables(task_type):
+    """Resolves the task type into the models and functions used in the cross validation loops.
+
+    Parameters
+    ----------
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    Returns
+    -------
+    task: _Task
+        Final model fitted on the selected features, class of the inner splitter of the Lasso models,
+        prediction function (probability of the positive class for binary tasks), prediction used when no
+        feature is selected and held-out score of the points of the regularization path.
+    """
+    if task_type not in _TASKS:
+        raise ValueError("task_type not recognized.")
+    return _TASKS[task_type]
+
+
+def _inner_cv(task, n_repeats):
+    """Inner 5-fold cross validation, repeated `n_repeats` times, used to tune the Lasso models.
+
+    Parameters
+    ----------
+    task: _Task
+        Resolved task type, see `_task_callables`.
+
+    n_repeats: int
+        Number of repeats of the 5-fold cross validation.
+
+    Returns
+    -------
+    inner_splitter: RepeatedStratifiedKFold or RepeatedKFold
+    """
+    return task.inner_splitter(n_splits=5, n_repeats=n_repeats, random_state=42)
+
+
+class _NamedArray:
+    """Light container for a NumPy array along with its feature names and sample index.
+    Used instead of a pandas DataFrame inside the cross validation loops.
+
+    Parameters
+    ----------
+    X: np.ndarray, shape=(n_samples, n_features)
+        The data.
+
+    names: array-like, shape=(n_features, )
+        Names of the features.
+
+    index: pd.Index, shape=(n_samples, )
+        Index of the samples.
+    """
+    __slots__ = ("X", "names", "index")
+
+    def __init__(self, X, names, index):
+        self.X = X
+        self.names = np.asarray(names, dtype=object)
+        self.index = index
+
+
+def _concat_omics(data_dict, index):
+    """Concatenates the omics column-wise into a single float32 DataFrame.
+    The data is copied block by block in a pre-allocated C-contiguous array, samples missing
+    from an omic are filled with NaN.
+
+    Parameters
+    ----------
+    data_dict: dict
+        Dictionary containing the input omic-files.
+
+    index: pd.Index
+        Index of the samples of the output DataFrame.
+
+    Returns
+    -------
+    X_tot: pd.DataFrame, shape=(len(index), total number of features)
+        Concatenation of all the omics.
+    """
+    columns = list(itertools.chain.from_iterable(X_omic.columns for X_omic in data_dict.values()))
+    X_tot = np.empty((len(index), len(columns)), dtype=np.float32, order="C")
+
+    offset = 0
+    for X_omic in data_dict.values():
+        width = X_omic.shape[1]
+        X_tot[:, offset:offset + width] = X_omic.reindex(index).to_numpy(dtype=np.float32)
+        offset += width
+
+    return pd.DataFrame(data=X_tot, index=index, columns=columns, copy=False)
+
+
+def _fit_transform_named(pipeline, X):
+    """Fits the preprocessing pipeline on X and returns the transformed data along with its feature names.
+    The names are obtained by masking the columns of X with the supports of the feature selectors of the pipeline,
+    instead of going through get_feature_names_out, which validates and rebuilds the names at each step.
+
+    Parameters
+    ----------
+    pipeline: Pipeline
+        Preprocessing pipeline.
+
+    X: pd.DataFrame or _NamedArray
+        Data to fit and transform.
+
+    Returns
+    -------
+    X_std: _NamedArray
+        Transformed data.
+    """
+    if isinstance(X, _NamedArray):
+        X_std = pipeline.fit_transform(X.X)
+        names_in = X.names
+    else:
+        X_std = pipeline.fit_transform(X)
+        names_in = X.columns.to_numpy(dtype=object)
+
+    names = names_in
+    for _, step in pipeline.steps:
+        if isinstance(step, SelectorMixin):
+            names = names[step.get_support()]
+
+    if len(names) != X_std.shape[1]:
+        # A step other than a selector removed some features (e.g. empty features dropped by the imputer)
+        names = pipeline.get_feature_names_out(names_in)
+
+    return _NamedArray(X=X_std, names=names, index=X.index)
+
+
+def _take_rows(X, rows):
+    """Gathers the rows of X at the given positions. The positions equal to -1 (samples missing from an omic) give
+    rows of NaN.
+
+    Parameters
+    ----------
+    X: np.ndarray, shape=(n_samples, n_features)
+        Float data.
+
+    rows: np.ndarray, shape=(n_rows, )
+        Positions of the rows, -1 for the missing samples.
+
+    Returns
+    -------
+    X_rows: np.ndarray, shape=(n_rows, n_features)
+    """
+    X_rows = X[rows]
+    X_rows[rows < 0] = np.nan
+    return X_rows
+
+
+def _transform_rows(omic_preprocessing, X_omic, X_fit_std, fit_rows, rows, out=None):
+    """Preprocesses the rows of an omic at the given positions, reusing the rows already preprocessed when
+    fitting the preprocessing and transforming only the other ones.
+
+    Parameters
+    ----------
+    omic_preprocessing: Pipeline
+        Preprocessing fitted on the rows `fit_rows` of the omic.
+
+    X_omic: np.ndarray, shape=(n_samples_omic, n_features)
+        Raw data of the omic.
+
+    X_fit_std: np.ndarray, shape=(len(fit_rows), n_features_out)
+        Output of the fit_transform of the preprocessing.
+
+    fit_rows: np.ndarray
+        Positions of the rows of the omic used to fit the preprocessing.
+
+    rows: np.ndarray, shape=(n_rows, )
+        Positions of the rows to preprocess, -1 for the missing samples.
+
+    out: np.ndarray, shape=(n_rows, n_features_out), default=None
+        Array (or view) where the preprocessed rows are written. If None, a new array is allocated.
+
+    Returns
+    -------
+    X_rows_std: np.ndarray, shape=(n_rows, n_features_out)
+        The out array when given.
+    """
+    fit_pos = np.full(len(X_omic) + 1, -1, dtype=np.intp)  # Last slot for the missing samples (-1)
+    fit_pos[fit_rows] = np.arange(len(fit_rows))
+    rows_fit_pos = fit_pos[rows]
+    already_std = rows_fit_pos >= 0
+
+    X_rows_std = np.empty((len(rows), X_fit_std.shape[1]), dtype=X_fit_std.dtype) if out is None else out
+    X_rows_std[already_std] = X_fit_std[rows_fit_pos[already_std]]
+    if not already_std.all():
+        X_rows_std[~already_std] = omic_preprocessing.transform(_take_rows(X_omic, rows[~already_std]))
+    return X_rows_std
+
+
+def _to_float32(data_dict):
+    """Downcasts every omic of the dictionary to float32, the omics already in float32 are not copied.
+
+    Parameters
+    ----------
+    data_dict: dict
+        Dictionary containing the input omic-files.
+
+    Returns
+    -------
+    data_dict: dict
+        Dictionary containing the float32 omic-files.
+    """
+    return {omic_name: X_omic.astype(np.float32, copy=False) for omic_name, X_omic in data_dict.items()}
+
+
+def _resolve_n_jobs_inner(n_jobs_outer, n_jobs_inner):
+    """Number of jobs of the estimators fitted inside an outer loop. By default, the inner estimators use all the
+    cores when the outer loop is sequential and a single core otherwise, to avoid n_jobs_outer x n_cores workers.
+
+    Parameters
+    ----------
+    n_jobs_outer: int
+        Number of jobs of the outer loop.
+
+    n_jobs_inner: int or None
+        Number of jobs of the inner estimators. If None, -1 if n_jobs_outer is 1 and 1 otherwise.
+
+    Returns
+    -------
+    n_jobs_inner: int
+    """
+    if n_jobs_inner is not None:
+        return n_jobs_inner
+    return -1 if n_jobs_outer == 1 else 1
+
+
+def _to_csv_linked(df, path, *copy_paths):
+    """Writes the DataFrame to a csv file once, the other paths are hard links to this file (or copies when the
+    file system does not support hard links).
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame to write.
+
+    path: Path or str
+        Where to write the csv file.
+
+    copy_paths: Path or str
+        Other paths where the csv file should appear.
+    """
+    df.to_csv(path)
+    for copy_path in copy_paths:
+        if os.path.lexists(copy_path):
+            os.remove(copy_path)
+        try:
+            os.link(path, copy_path)
+        except OSError:
+            shutil.copyfile(path, copy_path)
+
+
+def _save_selected_features(df, path, features_format="csv"):
+    """Writes the table of the features selected at each fold.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Table with the "Fold selected features" (lists of features) and "Fold nb of features" columns.
+
+    path: Path
+        Path of the file, without extension.
+
+    features_format: str, default="csv"
+        "csv" or "parquet". The parquet file keeps the lists of features as list columns and is faster to write
+        and to read for many folds (e.g. LeaveOneOut); it requires pyarrow or fastparquet.
+    """
+    _check_features_format(features_format)
+    if features_format == "csv":
+        df.to_csv(path.with_name(path.name + ".csv"))
+    else:
+        df.to_parquet(path.with_name(path.name + ".parquet"))
+
+
+def _check_features_format(features_format):
+    """Checks the format of the files of selected features, called before running the cross validation."""
+    if features_format not in ("csv", "parquet"):
+        raise ValueError(f"features_format must be 'csv' or 'parquet'. Got: {features_format}")
+    if features_format == "parquet" and not any(importlib.util.find_spec(e) for e in ("pyarrow", "fastparquet")):
+        raise ImportError("features_format='parquet' requires pyarrow or fastparquet.")
+
+
+def _median_over_folds(fold_predictions, index):
+    """Computes the median prediction of each sample over the folds where it was in the test set.
+
+    Parameters
+    ----------
+    fold_predictions: list of tuples
+        List of (test_rows, predictions) tuples, one per fold, test_rows being the positions of the testing
+        samples in index.
+
+    index: pd.Index
+        Index of the samples.
+
+    Returns
+    -------
+    median_predictions: pd.Series
+        Median predictions over the folds. NaN for the samples that were never tested.
+    """
+    predictions = np.full((len(index), len(fold_predictions)), np.nan, dtype=np.float32)
+    n_tests = np.zeros(len(index), dtype=np.int64)
+    for j, (rows, preds) in enumerate(fold_predictions):
+        predictions[rows, j] = preds
+        n_tests[rows] += 1
+
+    if n_tests.max(initial=0) <= 1:
+        # Each sample is tested at most once (e.g. LeaveOneOut or KFold): its only prediction is the median
+        median_predictions = np.nansum(predictions, axis=1)
+        median_predictions[n_tests == 0] = np.nan
+        return pd.Series(median_predictions, index=index)
+
+    # Median of the non-NaN values of each row: the NaN values are sorted last, so the middle values of a row with
+    # k predictions are at positions (k - 1) // 2 and k // 2. Faster than np.nanmedian for many rows.
+    predictions.sort(axis=1)
+    low = np.take_along_axis(predictions, np.maximum(n_tests - 1, 0)[:, None] // 2, axis=1)[:, 0]
+    high = np.take_along_axis(predictions, n_tests[:, None] // 2, axis=1)[:, 0]
+    median_predictions = (low + high) / 2
+    # Samples that were never in a test set
+    median_predictions[n_tests == 0] = np.nan
+
+    return pd.Series(median_predictions, index=index)
+
+
+def _score_path_point(model, X, y, train, test, param, value, path_score, coef_init=None):
+    """Fits the model on the training samples of one split at one point of the regularization path and scores it
+    on the held-out samples with `path_score` (ROC AUC for binary tasks, negative MSE for regression tasks).
+
+    Returns
+    -------
+    coef: np.ndarray
+        Coefficients of the fitted model, used to warm start the next point of the path.
+
+    score: float
+        Score on the held-out samples.
+    """
+    model = clone(model).set_params(**{param: value})
+    if coef_init is not None:
+        model.set_params(warm_start=True)
+        model.coef_ = coef_init.copy()
+    model.fit(X[train], y[train])
+
+    return model.coef_, path_score(model, X[test], y[test])
+
+
+def _path_lasso_cv(X, y, task_type, cv, n_points=10, eps=1e-3, patience=3, n_jobs=-1):
+    """Cross-validated Lasso searching the regularization path from coarse to fine.
+    A coarse grid of `n_points` values is evaluated from the most to the least regularized model and the search
+    stops as soon as the mean held-out score has not improved for `patience` points. The grid is then refined with
+    `n_points` values around the best one. For regression tasks, the fits of a split are warm started from the
+    previous point of the path (liblinear does not support warm start).
+
+    Parameters
+    ----------
+    X: np.ndarray, shape=(n_samples, n_features)
+        Preprocessed data.
+
+    y: array-like, shape=(n_samples, )
+        Outcomes.
+
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    cv: sklearn.model_selection._split.BaseCrossValidator
+        Cross validation splitter.
+
+    n_points: int, default=10
+        Number of points of the coarse and of the fine grids.
+
+    eps: float, default=1e-3
+        Length of the path: ratio between the least and the most regularized models.
+
+    patience: int, default=3
+        Number of points without improvement of the score before stopping the search.
+
+    n_jobs: int, default=-1
+        Number of splits fitted in parallel (threads).
+
+    Returns
+    -------
+    model: LogisticRegression or Lasso
+        Model refitted on all the samples with the best regularization.
+    """
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    path_score = _task_callables(task_type).path_score
+
+    if task_type == "binary":
+        model, param, warm_start = logit_lasso, "C", False
+        # From the first C giving a non-empty model to the least regularized model
+        c_min = l1_min_c(X, y, loss="log")
+        grid = np.geomspace(c_min, c_min / eps, n_points)
+    else:
+        model, param, warm_start = lasso, "alpha", True
+        alpha_max = np.abs(X.T @ (y - y.mean())).max() / X.shape[0]
+        grid = np.geomspace(alpha_max, alpha_max * eps, n_points)
+
+    # The backend is named, so that the folds run on threads whatever the backend of the caller's context
+    with Parallel(n_jobs=n_jobs, backend="threading") as parallel:
+        def search(values, coefs):
+            scores, path_coefs = [], []
+            best_score, n_no_improvement = -np.inf, 0
+            for value in values:
+                results = parallel(
+                    delayed(_score_path_point)(
+                        model, X, y, train, test, param, value, path_score, coef_init=coef if warm_start else None
+                    )
+                    for (train, test), coef in zip(splits, coefs)
+                )
+                coefs = [coef for coef, _ in results]
+                scores.append(np.mean([score for _, score in results]))
+                path_coefs.append(coefs)
+
+                if scores[-1] > best_score:
+                    best_score, n_no_improvement = scores[-1], 0
+                elif any(np.any(coef != 0) for coef in coefs):
+                    # The empty models at the start of the path do not count as a plateau
+                    n_no_improvement += 1
+                if n_no_improvement >= patience:
+                    break
+            return scores, path_coefs
+
+        coarse_scores, coarse_coefs = search(grid, [None] * len(splits))
+        best = int(np.argmax(coarse_scores))
+        low, high = max(best - 1, 0), min(best + 1, len(coarse_scores) - 1)
+
+        values = list(grid[:len(coarse_scores)])
+        scores = list(coarse_scores)
+        if low < high:
+            fine_grid = np.geomspace(grid[low], grid[high], n_points + 2)[1:-1]
+            fine_scores, _ = search(fine_grid, coarse_coefs[low])
+            values += list(fine_grid[:len(fine_scores)])
+            scores += fine_scores
+
+    return clone(model).set_params(**{param: values[int(np.argmax(scores))]}).fit(X, y)
+
+
+# Parameters of Stabl that do not change the bootstrap fits, only the final selection or the execution
+_SELECTION_ONLY_PARAMS = {"hard_threshold", "fdr_threshold_range", "verbose", "n_jobs", "backend_multi"}
+
+
+def _equal_params(a, b):
+    """Whether two parameter values are equal, comparing estimators by their parameters and arrays element-wise."""
+    if isinstance(a, BaseEstimator) or isinstance(b, BaseEstimator):
+        return type(a) is type(b) and all(
+            _equal_params(value, b.get_params(deep=False)[name]) for name, value in a.get_params(deep=False).items()
+        )
+    if isinstance(a, (np.ndarray, list, tuple)) or isinstance(b, (np.ndarray, list, tuple)):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+    return a is b or bool(a == b)
+
+
+def _same_bootstrap_fits(stabl, stability_selection):
+    """Whether STABL and stability selection fit the same bootstraps, in which case the stability scores of STABL
+    can be used for stability selection. This is the case when all their parameters, except the ones only used for
+    the final selection, are equal (in particular artificial_type, STABL usually fits artificial features).
+
+    Parameters
+    ----------
+    stabl: Stabl
+
+    stability_selection: Stabl
+
+    Returns
+    -------
+    same_fits: bool
+    """
+    params, ss_params = stabl.get_params(deep=False), stability_selection.get_params(deep=False)
+    return all(
+        _equal_params(value, ss_params[name]) for name, value in params.items() if name not in _SELECTION_ONLY_PARAMS
+    )
+
+
+def _fit_one_omic(omic_name, X_omic, y_omic, keep_rows, stabl, stability_selection, task_type):
+    """Preprocesses one omic on the training samples of a fold and selects its features with STABL and
+    stability selection.
+
+    Parameters
+    ----------
+    omic_name: str
+        Name of the omic, only used for printing.
+
+    X_omic: _NamedArray
+        Data of the omic.
+
+    y_omic: np.ndarray
+        Outcomes of the samples of the omic.
+
+    keep_rows: np.ndarray
+        Positions of the training samples in the omic.
+
+    stabl: Stabl
+        STABL used to select features, it is cloned before being fitted.
+
+    stability_selection: Stabl
+        Stability selection used to select features, it is cloned before being fitted.
+
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    Returns
+    -------
+    omic_preprocessing: Pipeline
+        Preprocessing fitted on the training samples of the omic.
+
+    X_tmp_std: _NamedArray
+        Preprocessed training samples of the omic.
+
+    omic_selected_cols: dict
+        Dictionary of the positions, in the columns of X_tmp_std, of the features selected by STABL and by
+        stability selection at each threshold.
+    """
+    X_tmp = _NamedArray(X=X_omic.X[keep_rows], names=X_omic.names, index=X_omic.index[keep_rows])
+    y_tmp = y_omic[keep_rows]
+    stabl = clone(stabl)
+    stability_selection = clone(stability_selection)
+
+    # Each fold fits its own copy of the preprocessing so that folds can run concurrently
+    omic_preprocessing = clone(preprocessing)
+    X_tmp_std = _fit_transform_named(omic_preprocessing, X_tmp)
+
+    # __STABL__
+    if task_type == "binary":
+        min_C = l1_min_c(X_tmp_std.X, y_tmp)
+        lambda_grid = np.linspace(min_C, min_C * 100, 10)
+        stabl.set_params(lambda_grid=lambda_grid)
+        stability_selection.set_params(lambda_grid=lambda_grid)
+
+    stabl.fit(X_tmp_std.X, y_tmp)
+    omic_selected_cols = {"STABL": np.flatnonzero(stabl.get_support())}
+
+    print(
+        f"STABL finished on {omic_name} ({len(keep_rows)} samples);"
+        f" {len(omic_selected_cols['STABL'])} features selected\n"
+    )
+
+    # __SS__
+    if _same_bootstrap_fits(stabl, stability_selection):
+        stability_selection = stabl
+    else:
+        stability_selection.fit(X_tmp_std.X, y_tmp)
+    # Same selection as get_support(new_hard_threshold=...)
+    ss_max_scores = stability_selection.max_scores_
+    for threshold, model in [(.3, "SS 03"), (.5, "SS 05"), (.8, "SS 08")]:
+        omic_selected_cols[model] = np.flatnonzero(ss_max_scores > threshold)
+
+    return omic_preprocessing, X_tmp_std, omic_selected_cols
+
+
+def _run_fold(
+        i,
+        train,
+        test,
+        y,
+        omics,
+        omic_rows,
+        omic_y,
+        valid_rows,
+        stabl,
+        stability_selection,
+        task_type,
+        n_splits,
+        final_lasso=False,
+        n_jobs_inner=-1,
+        omic_parallel=1,
+        inner_splitter=None
+):
+    """Runs one iteration of the outer cross validation: feature selection with STABL and stability selection
+    on each omic, then fit of the final models and of the early fusion Lasso. The final models and the early
+    fusion Lasso are fitted on the fold samples preprocessed by the pipelines fitted on each omic.
+
+    Parameters
+    ----------
+    i: int
+        Number of the fold (starting at 1).
+
+    train: array-like
+        Positional indices of the training samples.
+
+    test: array-like
+        Positional indices of the testing samples.
+
+    y: pd.Series
+        pandas Series containing the outcomes.
+
+    omics: dict
+        Dictionary containing the data of each omic as a _NamedArray.
+
+    omic_rows: dict
+        Dictionary containing, for each omic, the position in the omic of each sample of y (-1 if missing).
+
+    omic_y: dict
+        Dictionary containing, for each omic, the outcomes of its samples (only meaningful at valid_rows).
+
+    valid_rows: dict
+        Dictionary containing, for each omic, the positions of the samples that are not low info and have an
+        outcome.
+
+    stabl: Stabl
+        STABL used to select features on each omic.
+
+    stability_selection: Stabl
+        Stability selection used to select features on each omic.
+
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    n_splits: int
+        Total number of folds, only used for printing.
+
+    final_lasso: bool, default=False
+        If True, the final binary models are fitted with a cross-validated Lasso (see `_path_lasso_cv`) instead of
+        a logistic regression, and the features kept by the Lasso on top of STABL are stored under the
+        "Stabl_binary_lasso" key.
+
+    n_jobs_inner: int, default=-1
+        Number of jobs used by the cross-validated Lasso models.
+
+    omic_parallel: int, default=1
+        Number of omics processed in parallel. When different from 1, STABL and stability selection run their
+        bootstraps on a single core.
+
+    inner_splitter: sklearn.model_selection._split.BaseCrossValidator, default=None
+        Inner cross validation used to tune the Lasso models. If None, see `_inner_cv`.
+
+    Returns
+    -------
+    fold_results: dict
+        Dictionary containing the fold number "i", the positions of the testing samples "test", the predictions
+        of each model "preds" and the features selected by each model "selected".
+    """
+    print(f" Iteration {i} over {n_splits} ".center(80, '*'), "\n")
+
+    fold_selected_features = collections.defaultdict(list)
+    fold_predictions = dict()
+
+    print(f"{len(train)} train samples, {len(test)} test samples")
+
+    if omic_parallel != 1:
+        # Avoiding nested parallelism: the bootstraps of each omic run on a single core
+        stabl = clone(stabl).set_params(n_jobs=1)
+        stability_selection = clone(stability_selection).set_params(n_jobs=1)
+
+    y_values = y.to_numpy()
+    keep_rows = {
+        omic_name: valid_rows[omic_name][~np.isin(valid_rows[omic_name], omic_rows[omic_name][test])]
+        for omic_name in omics
+    }
+    omic_results = Parallel(n_jobs=omic_parallel, backend="loky")(
+        delayed(_fit_one_omic)(
+            omic_name,
+            X_omic,
+            y_omic=omic_y[omic_name],
+            keep_rows=keep_rows[omic_name],
+            stabl=stabl,
+            stability_selection=stability_selection,
+            task_type=task_type
+        )
+        for omic_name, X_omic in omics.items()
+    )
+
+    # Fitted preprocessing and preprocessed data of each omic, reused for the EF Lasso
+    per_omic_std = dict()
+    # Positions of the selected features in the columns of the fold matrices, where the omics are concatenated
+    fold_selected_cols = collections.defaultdict(list)
+    offset = 0
+    for omic_name, (omic_preprocessing, X_tmp_std, omic_selected_cols) in zip(omics, omic_results):
+        per_omic_std[omic_name] = (omic_preprocessing, X_tmp_std)
+        for model, cols in omic_selected_cols.items():
+            fold_selected_features[model] += X_tmp_std.names[cols].tolist()
+            fold_selected_cols[model].append(cols + offset)
+        offset += X_tmp_std.X.shape[1]
+
+    print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+    print(f"This fold: {len(fold_selected_features['STABL'])} features selected for STABL")
+    print(f"This fold: {len(fold_selected_features['SS 03'])} features selected for SS 03")
+    print(f"This fold: {len(fold_selected_features['SS 05'])} features selected for SS 05")
+    print(f"This fold: {len(fold_selected_features['SS 08'])} features selected for SS 08")
+    print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\n")
+
+    task = _task_callables(task_type)
+    final_lasso = final_lasso and task_type == "binary"
+    if inner_splitter is None:
+        inner_splitter = _inner_cv(task, n_repeats=2)
+
+    y_train = y_values[train]
+
+    # The preprocessing fitted on each omic is applied to the fold samples instead of fitting a new one on the
+    # selected features of each model. The samples missing from an omic are imputed by its preprocessing, the
+    # ones used to fit it are taken from its output.
+    # Each omic is written in its columns of a single buffer instead of being stacked afterwards
+    bounds = np.cumsum([0] + [X_omic_std.X.shape[1] for _, X_omic_std in per_omic_std.values()])
+    X_train_std = _NamedArray(
+        X=np.empty((len(train), bounds[-1]), dtype=np.float32),
+        names=np.concatenate([X_omic_std.names for _, X_omic_std in per_omic_std.values()]),
+        index=y.index[train]
+    )
+    for (omic_name, (omic_preprocessing, X_omic_std)), start, end in zip(per_omic_std.items(), bounds, bounds[1:]):
+        _transform_rows(
+            omic_preprocessing,
+            omics[omic_name].X,
+            X_omic_std.X,
+            keep_rows[omic_name],
+            omic_rows[omic_name][train],
+            out=X_train_std.X[:, start:end]
+        )
+    X_test_std = np.hstack([
+        omic_preprocessing.transform(_take_rows(omics[omic_name].X, omic_rows[omic_name][test]))
+        for omic_name, (omic_preprocessing, _) in per_omic_std.items()
+    ])
+    if final_lasso:
+        # Features kept by the final Lasso on top of STABL, empty if STABL selects no feature
+        fold_selected_features["Stabl_binary_lasso"] = []
+
+    for model in ["STABL", "SS 03", "SS 05", "SS 08"]:
+        if len(fold_selected_features[model]) > 0:
+            features_cols = np.concatenate(fold_selected_cols[model])
+            X_train = X_train_std.X[:, features_cols]
+            X_test = X_test_std[:, features_cols]
+
+            # __Final Models__
+            if final_lasso:
+                model_lasso = _path_lasso_cv(X_train, y_train, task_type, cv=inner_splitter, n_jobs=n_jobs_inner)
+                predictions = task.predict(model_lasso, X_test)
+                if model == "STABL":
+                    fold_selected_features["Stabl_binary_lasso"] = \
+                        X_train_std.names[features_cols[np.flatnonzero(model_lasso.coef_)]].tolist()
+            else:
+                predictions = task.predict(clone(task.final_model).fit(X_train, y_train), X_test)
+
+        else:
+            # If no features are selected, predict the intercept//0.5
+            predictions = np.full(len(test), task.default_prediction(y_train))
+
+        fold_predictions[model] = predictions
+
+    # __EF Lasso__
+    model = _path_lasso_cv(X_train_std.X, y_train, task_type, cv=inner_splitter, n_jobs=n_jobs_inner)
+    predictions = task.predict(model, X_test_std)
+
+    fold_selected_features["EF Lasso"] = X_train_std.names[np.flatnonzero(model.coef_)].tolist()
+    fold_predictions["EF Lasso"] = predictions
+
+    return {"i": i, "test": test, "preds": fold_predictions, "selected": dict(fold_selected_features)}
+
+
+def _blas_threads_per_fold(n_jobs_outer):
+    """Number of BLAS threads of each fold: the cores are shared between the folds processed in parallel, otherwise
+    n_jobs_outer x n_cores threads compete. Can be set with the STABL_BLAS_THREADS_PER_FOLD environment variable.
+
+    Parameters
+    ----------
+    n_jobs_outer: int
+        Number of folds processed in parallel.
+
+    Returns
+    -------
+    blas_threads: int or None
+        None (no limit) when the folds are processed sequentially.
+    """
+    if "STABL_BLAS_THREADS_PER_FOLD" in os.environ:
+        return int(os.environ["STABL_BLAS_THREADS_PER_FOLD"])
+    if n_jobs_outer == 1:
+        return None
+    return max(1, (os.cpu_count() or 1) // effective_n_jobs(n_jobs_outer))
+
+
+def _run_fold_limited(blas_threads, *args, **kwargs):
+    """Runs `_run_fold` with the BLAS thread pools limited to `blas_threads` threads (no limit if None)."""
+    with threadpool_limits(limits=blas_threads, user_api="blas"):
+        return _run_fold(*args, **kwargs)
+
+
+def _run_outer_cv(
+        data_dict,
+        y,
+        outer_splitter,
+        stabl,
+        stability_selection,
+        task_type,
+        outer_groups=None,
+        n_jobs_outer=1,
+        n_jobs_inner=None,
+        final_lasso=False,
+        omic_parallel=1,
+        dask_client=None,
+        inner_cv_n_repeats=2
+):
+    """Dispatches the folds of the outer cross validation with joblib and gathers the results.
+    See `_run_fold` for the description of the parameters.
+
+    Returns
+    -------
+    predictions_dict: dict
+        Dictionary of the median predictions of each model over the folds.
+
+    selected_features_dict: dict
+        Dictionary of the lists of features selected by each model at each fold.
+    """
+    # Fails before processing any fold if the task type is unknown
+    inner_splitter = _inner_cv(_task_callables(task_type), inner_cv_n_repeats)
+    # The folds work on the omics directly, the splitter only uses the number of samples of X
+    X_split = np.empty((len(y), 0), dtype=np.float32)
+    n_splits = outer_splitter.get_n_splits(X_split, y, groups=outer_groups)
+    data_dict = _to_float32(data_dict)
+
+    # The folds work on the arrays of the omics and on row positions instead of pandas labels
+    omics = {
+        omic_name: _NamedArray(X=X_omic.to_numpy(), names=X_omic.columns, index=X_omic.index)
+        for omic_name, X_omic in data_dict.items()
+    }
+    omic_rows = {omic_name: X_omic.index.get_indexer(y.index) for omic_name, X_omic in data_dict.items()}
+    omic_y = {omic_name: y.to_numpy()[y.index.get_indexer(X_omic.index)] for omic_name, X_omic in data_dict.items()}
+    # The low info samples and the samples without outcome do not depend on the fold
+    valid_rows = {
+        omic_name: X_omic.index.get_indexer(remove_low_info_samples(X_omic).index.intersection(y.index, sort=False))
+        for omic_name, X_omic in data_dict.items()
+    }
+
+    if dask_client is not None:
+        # The folds are spread over all the workers of the cluster
+        n_jobs_outer = -1
+
+    if n_jobs_outer != 1 or n_jobs_inner is not None:
+        # Avoiding nested parallelism: by default each fold runs its models on a single core
+        n_jobs_inner = _resolve_n_jobs_inner(n_jobs_outer, n_jobs_inner)
+        stabl = clone(stabl).set_params(n_jobs=n_jobs_inner)
+        stability_selection = clone(stability_selection).set_params(n_jobs=n_jobs_inner)
+    else:
+        n_jobs_inner = -1
+
+    if dask_client is not None:
+        # The data is sent once to the workers instead of being pickled with each fold. The dask backend
+        # needs the context to receive the client; the nested Parallel calls name their own backends
+        backend = parallel_backend("dask", client=dask_client, scatter=[y, omics, omic_rows, omic_y, valid_rows])
+        parallel = Parallel(batch_size=1)
+    else:
+        # Backend given to the outer Parallel only, not as a context inherited by the nested calls
+        backend = contextlib.nullcontext()
+        parallel = Parallel(n_jobs=n_jobs_outer, backend="loky", batch_size=1)
+
+    blas_threads = _blas_threads_per_fold(n_jobs_outer)
+
+    with backend:
+        results = parallel(
+            delayed(_run_fold_limited)(
+                blas_threads,
+                i,
+                train,
+                test,
+                y=y,
+                omics=omics,
+                omic_rows=omic_rows,
+                omic_y=omic_y,
+                valid_rows=valid_rows,
+                stabl=stabl,
+                stability_selection=stability_selection,
+                task_type=task_type,
+                n_splits=n_splits,
+                final_lasso=final_lasso,
+                n_jobs_inner=n_jobs_inner,
+                omic_parallel=omic_parallel,
+                inner_splitter=inner_splitter
+            )
+            for i, (train, test) in enumerate(outer_splitter.split(X_split, y, groups=outer_groups), 1)
+        )
+
+    predictions_dict = collections.defaultdict(list)
+    selected_features_dict = collections.defaultdict(list)
+    for r in results:
+        for model, predictions in r["preds"].items():
+            predictions_dict[model].append((r["test"], np.asarray(predictions)))
+
+        for model, features in r["selected"].items():
+            selected_features_dict[model].append(features)
+
+    predictions_dict = {model: _median_over_folds(predictions_dict[model], y.index) for model in predictions_dict}
+
+    return predictions_dict, dict(selected_features_dict)
+
+
 def multi_omic_stabl_cv(
         data_dict,
         y,
@@ -55,7 +988,13 @@ def multi_omic_stabl_cv(
         stability_selection,
         task_type,
         save_path,
-        outer_groups=None
+        outer_groups=None,
+        n_jobs_outer=1,
+        n_jobs_inner=None,
+        omic_parallel=1,
+        dask_client=None,
+        inner_cv_n_repeats=2,
+        features_format="csv"
 ):
     """
 
@@ -84,156 +1023,57 @@ def multi_omic_stabl_cv(
     outer_groups: pd.Series, default=None
         If used, should be the same size as y and should indicate the groups of the samples.
 
-    Returns
-    -------
-
-    """
-    models = ["STABL", "SS 03", "SS 05", "SS 08", "EF Lasso"]
-
-    os.makedirs(Path(save_path, "Training CV"), exist_ok=True)
-    os.makedirs(Path(save_path, "Summary"), exist_ok=True)
-
-    # Initializing the df containing the data of all omics
-    X_tot = pd.concat(data_dict.values(), axis="columns")
-    predictions_dict = dict()
-    selected_features_dict = dict()
-
-    for model in models:
-        predictions_dict[model] = pd.DataFrame(data=None, index=y.index)
-        selected_features_dict[model] = []
-
-    i = 1
-    for train, test in outer_splitter.split(X_tot, y, groups=outer_groups):
-        print(f" Iteration {i} over {outer_splitter.get_n_splits()} ".center(80, '*'), "\n")
-        train_idx, test_idx = y.iloc[train].index, y.iloc[test].index
-
-        fold_selected_features = dict()
-        for model in models:
-            fold_selected_features[model] = []
-
-        print(f"{len(train_idx)} train samples, {len(test_idx)} test samples")
-
-        for omic_name, X_omic in data_dict.items():
-            X_tmp: pd.DataFrame = X_omic.drop(index=test_idx, errors="ignore")
-
-            # Preprocessing of X_tmp
-            X_tmp = remove_low_info_samples(X_tmp)
-            y_tmp = y.loc[X_tmp.index]
-
-            X_tmp_std = pd.DataFrame(
-                data=preprocessing.fit_transform(X_tmp),
-                index=X_tmp.index,
-                columns=preprocessing.get_feature_names_out()
-            )
-
-            # __STABL__
-            if task_type == "binary":
-                min_C = l1_min_c(X_tmp_std, y_tmp)
-                lambda_grid = np.linspace(min_C, min_C * 100, 10)
-                stabl.set_params(lambda_grid=lambda_grid)
-                stability_selection.set_params(lambda_grid=lambda_grid)
-
-            stabl.fit(X_tmp_std, y_tmp)
-            tmp_sel_features = list(stabl.get_feature_names_out())
-            fold_selected_features["STABL"].extend(tmp_sel_features)
-
-            print(
-                f"STABL finished on {omic_name} ({X_tmp.shape[0]} samples);"
-                f" {len(tmp_sel_features)} features selected\n"
-            )
-
-            # __SS__
-            stability_selection.fit(X_tmp_std, y_tmp)
-            fold_selected_features["SS 03"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.3))
-            fold_selected_features["SS 05"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.5))
-            fold_selected_features["SS 08"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.8))
-
-        selected_features_dict["STABL"].append(fold_selected_features["STABL"])
-        selected_features_dict[f"SS 03"].append(fold_selected_features["SS 03"])
-        selected_features_dict[f"SS 05"].append(fold_selected_features["SS 05"])
-        selected_features_dict[f"SS 08"].append(fold_selected_features["SS 08"])
-
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-        print(f"This fold: {len(fold_selected_features['STABL'])} features selected for STABL")
-        print(f"This fold: {len(fold_selected_features['SS 03'])} features selected for SS 03")
-        print(f"This fold: {len(fold_selected_features['SS 05'])} features selected for SS 05")
-        print(f"This fold: {len(fold_selected_features['SS 08'])} features selected for SS 08")
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\n")
-
-        for model in ["STABL", "SS 03", "SS 05", "SS 08"]:
-            X_train = X_tot.loc[train_idx, fold_selected_features[model]]
-            X_test = X_tot.loc[test_idx, fold_selected_features[model]]
-            y_train, y_test = y.loc[train_idx], y.loc[test_idx]
-
-            if len(fold_selected_features[model]) > 0:
-                # Standardization
-                std_pipe = Pipeline(
-                    steps=[
-                        ('imputer', SimpleImputer(strategy="median")),
-                        ('std', StandardScaler())
-                    ]
-                )
+    n_jobs_outer: int, default=1
+        Number of folds of the outer cross validation processed in parallel. Each worker holds a copy of the
+        data and fits its own models, so the peak memory grows linearly with n_jobs_outer.
+        The cores are split between the folds for the BLAS threads, see the STABL_BLAS_THREADS_PER_FOLD
+        environment variable to override it.
 
-                X_train = pd.DataFrame(
-                    data=std_pipe.fit_transform(X_train),
-                    index=X_train.index,
-                    columns=X_train.columns
-                )
-                X_test = pd.DataFrame(
-                    data=std_pipe.transform(X_test),
-                    index=X_test.index,
-                    columns=X_test.columns
-                )
+    n_jobs_inner: int, default=None
+        Number of jobs used by STABL, stability selection and the Lasso models inside each fold. If None, 1 when
+        n_jobs_outer is different from 1 to avoid oversubscription; otherwise STABL and stability selection keep
+        their own n_jobs and the Lasso models use all the cores.
 
-                # __Final Models__
-                if task_type == "binary":
-                    predictions = clone(logit).fit(X_train, y_train).predict_proba(X_test)[:, 1].flatten()
+    omic_parallel: int, default=1
+        Number of omics processed in parallel inside each fold. When different from 1, STABL and stability
+        selection run their bootstraps on a single core. Useful with many omics and more cores than bootstraps.
 
-                elif task_type == "regression":
-                    predictions = clone(linreg).fit(X_train, y_train).predict(X_test)
+    dask_client: dask.distributed.Client, default=None
+        If given, the folds of the outer cross validation are processed on the dask cluster instead of the local
+        loky workers, and n_jobs_outer is ignored. The data is scattered once to the workers; each worker still
+        holds a full copy of it, so the memory of the smallest worker bounds the size of the data.
 
-                else:
-                    raise ValueError("task_type not recognized.")
+    inner_cv_n_repeats: int, default=2
+        Number of repeats of the inner 5-fold cross validation used to tune the Lasso models.
 
-                predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = predictions
+    features_format: str, default="csv"
+        Format of the files of the features selected at each fold: "csv" or "parquet" (requires pyarrow or
+        fastparquet).
 
-            else:
-                if task_type == "binary":
-                    predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = [0.5] * len(test_idx)
-
-                elif task_type == "regression":
-                    predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = [np.mean(y_train)] * len(test_idx)
-
-                else:
-                    raise ValueError("task_type not recognized.")
-        # __EF Lasso__
-        X_train = X_tot.loc[train_idx]
-        X_test = X_tot.loc[test_idx]
-        X_train = pd.DataFrame(
-            data=preprocessing.fit_transform(X_train),
-            columns=preprocessing.get_feature_names_out(),
-            index=X_train.index
-        )
+    Returns
+    -------
 
-        X_test = pd.DataFrame(
-            data=preprocessing.transform(X_test),
-            columns=preprocessing.get_feature_names_out(),
-            index=X_test.index
-        )
+    """
+    models = ["STABL", "SS 03", "SS 05", "SS 08", "EF Lasso"]
 
-        if task_type == "binary":
-            inner_splitter = RepeatedStratifiedKFold(n_splits=5, n_repeats=5, random_state=42)
-            model = clone(logit_lasso_cv).set_params(cv=inner_splitter)
-            predictions = model.fit(X_train, y_train).predict_proba(X_test)[:, 1]
-        else:
-            inner_splitter = RepeatedKFold(n_splits=5, n_repeats=5, random_state=42)
-            model = clone(lasso_cv).set_params(cv=inner_splitter)
-            predictions = model.fit(X_train, y_train).predict(X_test)
-            
-        selected_features_dict["EF Lasso"].append(list(X_train.columns[np.where(model.coef_.flatten())]))
-        predictions_dict["EF Lasso"].loc[test_idx, f"Fold n°{i}"] = predictions
+    _check_features_format(features_format)
+    os.makedirs(Path(save_path, "Training CV"), exist_ok=True)
+    os.makedirs(Path(save_path, "Summary"), exist_ok=True)
 
-        i += 1
+    predictions_dict, selected_features_dict = _run_outer_cv(
+        data_dict=data_dict,
+        y=y,
+        outer_splitter=outer_splitter,
+        stabl=stabl,
+        stability_selection=stability_selection,
+        task_type=task_type,
+        outer_groups=outer_groups,
+        n_jobs_outer=n_jobs_outer,
+        n_jobs_inner=n_jobs_inner,
+        omic_parallel=omic_parallel,
+        dask_client=dask_client,
+        inner_cv_n_repeats=inner_cv_n_repeats
+    )
 
     # __SAVING_RESULTS__
 
@@ -255,11 +1095,11 @@ def multi_omic_stabl_cv(
                 "Fold selected features": selected_features_dict[model],
                 "Fold nb of features": [len(el) for el in selected_features_dict[model]]
             },
-            index=[f"Fold {i}" for i in range(outer_splitter.get_n_splits())]
+            index=[f"Fold {i}" for i in range(len(selected_features_dict[model]))]
+        )
+        _save_selected_features(
+            formatted_features_dict[model], Path(cv_res_path, f"Selected Features {model}"), features_format
         )
-        formatted_features_dict[model].to_csv(Path(cv_res_path, f"Selected Features {model}.csv"))
-
-    predictions_dict = {model: predictions_dict[model].median(axis=1) for model in predictions_dict.keys()}
 
     table_of_scores = compute_scores_table(
         predictions_dict=predictions_dict,
@@ -268,8 +1108,9 @@ def multi_omic_stabl_cv(
         selected_features_dict=formatted_features_dict
     )
 
-    table_of_scores.to_csv(Path(summary_res_path, "Scores training CV.csv"))
-    table_of_scores.to_csv(Path(cv_res_path, "Scores training CV.csv"))
+    _to_csv_linked(
+        table_of_scores, Path(summary_res_path, "Scores training CV.csv"), Path(cv_res_path, "Scores training CV.csv")
+    )
 
     save_plots(
         predictions_dict=predictions_dict,
@@ -289,7 +1130,9 @@ def multi_omic_stabl(
         task_type,
         save_path,
         X_test=None,
-        y_test=None
+        y_test=None,
+        n_jobs_inner=None,
+        inner_cv_n_repeats=2
 ):
     """
 
@@ -310,6 +1153,13 @@ def multi_omic_stabl(
 
     y_test: pd.Series, default=None
 
+    n_jobs_inner: int, default=None
+        Number of jobs used by STABL, stability selection and the EF Lasso. If None, STABL and stability
+        selection keep their own n_jobs and the EF Lasso uses all the cores.
+
+    inner_cv_n_repeats: int, default=2
+        Number of repeats of the inner 5-fold cross validation used to tune the EF Lasso.
+
     Returns
     -------
 
@@ -319,8 +1169,14 @@ def multi_omic_stabl(
     os.makedirs(Path(save_path, "Training-Validation"), exist_ok=True)
     os.makedirs(Path(save_path, "Summary"), exist_ok=True)
 
+    if n_jobs_inner is not None:
+        stabl = clone(stabl).set_params(n_jobs=n_jobs_inner)
+        stability_selection = clone(stability_selection).set_params(n_jobs=n_jobs_inner)
+    n_jobs_inner = _resolve_n_jobs_inner(1, n_jobs_inner)
+
     # Initializing the df containing the data of all omics
-    X_tot = pd.concat(data_dict.values(), axis="columns")
+    data_dict = _to_float32(data_dict)
+    X_tot = _concat_omics(data_dict, y.index)
 
     predictions_dict = dict()
     selected_features_dict = dict()
@@ -328,16 +1184,13 @@ def multi_omic_stabl(
         selected_features_dict[model] = []
 
     for omic_name, X_omic in data_dict.items():
-        X_omic_std = pd.DataFrame(
-            data=preprocessing.fit_transform(X_omic),
-            index=X_omic.index,
-            columns=preprocessing.get_feature_names_out()
-        )
+        X_omic_std = _fit_transform_named(preprocessing, X_omic)
+        X_omic_std = pd.DataFrame(data=X_omic_std.X, index=X_omic.index, columns=X_omic_std.names)
         y_omic = y.loc[X_omic_std.index]
 
         stabl.fit(X_omic_std, y_omic)
         omic_selected_features = stabl.get_feature_names_out()
-        selected_features_dict["STABL"] += list(omic_selected_features)
+        selected_features_dict["STABL"] += omic_selected_features.tolist()
 
         print(f"STABL finished on {omic_name}; {len(omic_selected_features)} features selected")
 
@@ -349,38 +1202,35 @@ def multi_omic_stabl(
             task_type=task_type
         )
 
-        stability_selection.fit(X_omic_std, y_omic)
-        selected_features_dict["SS 03"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.3))
-        save_stabl_results(stabl=stability_selection,
-                           path=Path(save_path, "Training-Validation", f"SS 03 results on {omic_name}"), df_X=X_omic,
-                           y=y_omic, task_type=task_type, new_hard_threshold=.3)
-        selected_features_dict["SS 05"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.5))
-        save_stabl_results(stabl=stability_selection,
-                           path=Path(save_path, "Training-Validation", f"SS 05 results on {omic_name}"), df_X=X_omic,
-                           y=y_omic, task_type=task_type, new_hard_threshold=.5)
-        selected_features_dict["SS 08"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.8))
-        save_stabl_results(stabl=stability_selection,
-                           path=Path(save_path, "Training-Validation", f"SS 08 results on {omic_name}"), df_X=X_omic,
-                           y=y_omic, task_type=task_type, new_hard_threshold=.8)
-
-    final_prepro = Pipeline(
-        steps=[("impute", SimpleImputer(strategy="median")), ("std", StandardScaler())]
-    )
-
-    for model in ["STABL", "SS 03", "SS 05", "SS 08"]:
-        X_train = X_tot[selected_features_dict[model]]
-        X_train_std = pd.DataFrame(
-            data=final_prepro.fit_transform(X_train),
-            index=X_tot.index,
-            columns=final_prepro.get_feature_names_out()
-        )
+        if _same_bootstrap_fits(stabl, stability_selection):
+            fitted_ss = stabl
+        else:
+            fitted_ss = stability_selection.fit(X_omic_std, y_omic)
+        # Same selection as get_feature_names_out(new_hard_threshold=...)
+        ss_max_scores = fitted_ss.max_scores_
+        for threshold, model in [(.3, "SS 03"), (.5, "SS 05"), (.8, "SS 08")]:
+            selected_features_dict[model] += X_omic_std.columns.to_numpy()[ss_max_scores > threshold].tolist()
+            save_stabl_results(stabl=fitted_ss,
+                               path=Path(save_path, "Training-Validation", f"{model} results on {omic_name}"),
+                               df_X=X_omic, y=y_omic, task_type=task_type, new_hard_threshold=threshold)
+
+    # The imputation and the standardization are column-wise: fitting them once on all the features and
+    # slicing the selected columns is equivalent to fitting them on the features of each model
+    final_prepro = MedianImputeScaler()
+    X_tot_std = final_prepro.fit_transform(X_tot)
+    X_tot_names = final_prepro.get_feature_names_out()
+    col_pos = {name: j for j, name in enumerate(X_tot_names)}
 
-        if task_type == "binary":
-            base_linear_model = logit
+    if X_test is not None:
+        X_test_std = final_prepro.transform(X_test.reindex(columns=X_tot.columns))
 
-        else:
-            base_linear_model = linreg
+    task = _task_callables(task_type)
+    for model in ["STABL", "SS 03", "SS 05", "SS 08"]:
+        features = selected_features_dict[model]
+        features_cols = np.fromiter((col_pos[c] for c in features), dtype=np.intp, count=len(features))
+        X_train_std = X_tot_std[:, features_cols]
 
+        base_linear_model = task.final_model
         base_linear_model.fit(X_train_std, y)
         base_linear_model_coef = pd.DataFrame(
             {"Feature": selected_features_dict[model],
@@ -390,15 +1240,7 @@ def multi_omic_stabl(
         base_linear_model_coef.to_csv(Path(save_path, "Training-Validation", f"{model} coefficients.csv"))
 
         if X_test is not None:
-            X_test_std = pd.DataFrame(
-                data=final_prepro.transform(X_test[selected_features_dict[model]]),
-                index=X_test.index,
-                columns=final_prepro.get_feature_names_out()
-            )
-            if task_type == "binary":
-                model_preds = base_linear_model.predict_proba(X_test_std)[:, 1]
-            else:
-                model_preds = base_linear_model.predict(X_test_std)
+            model_preds = task.predict(base_linear_model, X_test_std[:, features_cols])
 
             predictions_dict[model] = pd.Series(
                 model_preds,
@@ -407,37 +1249,23 @@ def multi_omic_stabl(
             )
 
     # __EF Lasso__
-    X_train_std = pd.DataFrame(
-        data=final_prepro.fit_transform(X_tot),
-        index=X_tot.index,
-        columns=final_prepro.get_feature_names_out()
-    )
+    inner_splitter = _inner_cv(task, inner_cv_n_repeats)
+    model = _path_lasso_cv(X_tot_std, y, task_type, cv=inner_splitter, n_jobs=n_jobs_inner)
 
-    if task_type == "binary":
-        inner_splitter = RepeatedStratifiedKFold(n_splits=5, n_repeats=5, random_state=42)
-        model = clone(logit_lasso_cv).set_params(cv=inner_splitter).fit(X_train_std, y)
-    else:
-        inner_splitter = RepeatedKFold(n_splits=5, n_repeats=5, random_state=42)
-        model = clone(lasso_cv).set_params(cv=inner_splitter).fit(X_train_std, y)
-
-    selected_features_dict["EF Lasso"] += list(X_train_std.columns[np.where(model.coef_.flatten())])
+    coef = model.coef_.ravel()
+    nonzero_coef = np.flatnonzero(coef)
+    selected_features_dict["EF Lasso"] += X_tot_names[nonzero_coef].tolist()
 
     lasso_coef = pd.DataFrame(
         {"Feature": selected_features_dict["EF Lasso"],
-         "Associated weight": model.coef_.flatten()[np.where(model.coef_.flatten())]
+         "Associated weight": coef[nonzero_coef]
          }
     ).set_index("Feature")
     lasso_coef.to_csv(Path(save_path, "Training-Validation", f"EF Lasso coefficients.csv"))
 
     if X_test is not None:
-        X_test_std = pd.DataFrame(
-            data=final_prepro.transform(X_test),
-            index=X_test.index,
-            columns=final_prepro.get_feature_names_out()
-        )
-
         predictions_dict["EF Lasso"] = pd.Series(
-            data=model.predict(X_test_std) if task_type == "regression" else model.predict_proba(X_test_std)[:, 1],
+            data=task.predict(model, X_test_std),
             index=y_test.index,
             name="EF Lasso predictions"
         )
@@ -454,53 +1282,159 @@ def multi_omic_stabl(
             y=y_test,
             task_type=task_type,
         )
-        validation_scores.to_csv(Path(save_path, "Training-Validation", "Scores on Validation.csv"))
-        validation_scores.to_csv(Path(save_path, "Summary", "Scores on Validation.csv"))
+        _to_csv_linked(
+            validation_scores,
+            Path(save_path, "Training-Validation", "Scores on Validation.csv"),
+            Path(save_path, "Summary", "Scores on Validation.csv")
+        )
 
     return predictions_dict
 
 
-def late_fusion_lasso_cv(train_data_dict, y, outer_splitter, task_type, save_path, groups=None):
+def _late_fusion_fold(i, train, test, X_omic, y_omic, task_type, n_splits, inner_splitter, n_jobs_inner=-1):
+    """Fits the Lasso of one omic on one fold of the late fusion cross validation.
 
-    predictions_dict = {model: pd.DataFrame(data=None, index=y.index) for model in train_data_dict.keys()}
-    omics_selected_features = {model: [] for model in train_data_dict.keys()}
+    Parameters
+    ----------
+    i: int
+        Number of the fold (starting at 1), only used for printing.
 
-    for omic_name, X_omic in train_data_dict.items():
-        y_omic = y.loc[X_omic.index]
-        i = 1
-        print(f"Omic {omic_name}")
-        for train, test in outer_splitter.split(X_omic, y_omic, groups=groups):
-            print(f"Iteration {i} over {outer_splitter.get_n_splits()}")
+    train: array-like
+        Positional indices of the training samples.
 
-            train_idx, test_idx = y_omic.iloc[train].index, y_omic.iloc[test].index
-            X_train, X_test = X_omic.loc[train_idx], X_omic.loc[test_idx]
-            y_train, y_test = y_omic.loc[train_idx], y_omic.loc[test_idx]
+    test: array-like
+        Positional indices of the testing samples.
 
-            X_train_std = pd.DataFrame(
-                data=preprocessing.fit_transform(X_train),
-                index=X_train.index,
-                columns=preprocessing.get_feature_names_out()
-            )
+    X_omic: _NamedArray
+        Data of the omic.
 
-            X_test_std = pd.DataFrame(
-                data=preprocessing.transform(X_test),
-                index=X_test.index,
-                columns=preprocessing.get_feature_names_out()
-            )
+    y_omic: np.ndarray
+        Outcomes of the samples of the omic.
 
-            if task_type == "binary":
-                inner_splitter = RepeatedStratifiedKFold(n_splits=5, n_repeats=5, random_state=42)
-                model = clone(logit_lasso_cv).set_params(cv=inner_splitter)
-                predictions = model.fit(X_train_std, y_train).predict_proba(X_test_std)[:, 1]
-            else:
-                inner_splitter = RepeatedKFold(n_splits=5, n_repeats=5, random_state=42)
-                model = clone(lasso_cv).set_params(cv=inner_splitter)
-                predictions = model.fit(X_train_std, y_train).predict(X_test_std)
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    n_splits: int
+        Total number of folds, only used for printing.
+
+    inner_splitter: sklearn.model_selection._split.BaseCrossValidator
+        Inner cross validation used to tune the Lasso.
+
+    n_jobs_inner: int, default=-1
+        Number of jobs used by the cross-validated Lasso.
+
+    Returns
+    -------
+    test: array-like
+        Positional indices of the testing samples.
+
+    predictions: np.ndarray
+        Predictions on the testing samples.
+
+    selected_features: list
+        Features selected by the Lasso.
+    """
+    print(f"Iteration {i} over {n_splits}")
+
+    X_train = _NamedArray(X=X_omic.X[train], names=X_omic.names, index=X_omic.index[train])
+    X_test = X_omic.X[test]
+    y_train = y_omic[train]
+
+    omic_preprocessing = clone(preprocessing)
+    X_train_std = _fit_transform_named(omic_preprocessing, X_train)
+    X_test_std = omic_preprocessing.transform(X_test)
+
+    task = _task_callables(task_type)
+    model = _path_lasso_cv(X_train_std.X, y_train, task_type, cv=inner_splitter, n_jobs=n_jobs_inner)
+    predictions = task.predict(model, X_test_std)
+
+    return test, predictions, X_train_std.names[np.flatnonzero(model.coef_)].tolist()
+
+
+def late_fusion_lasso_cv(
+        train_data_dict,
+        y,
+        outer_splitter,
+        task_type,
+        save_path,
+        groups=None,
+        n_jobs_outer=1,
+        n_jobs_inner=None,
+        inner_cv_n_repeats=2,
+        features_format="csv"
+):
+    """Late fusion Lasso: a Lasso is fitted on each omic at each fold of the cross validation, and the
+    predictions of the omics are combined with stacked generalization.
+
+    Parameters
+    ----------
+    train_data_dict: dict
+        Dictionary containing the input omic-files.
+
+    y: pd.Series
+        pandas Series containing the outcomes.
+
+    outer_splitter: sklearn.model_selection._split.BaseCrossValidator
+        Outer cross validation splitter
+
+    task_type: str
+        Can either be "binary" for binary classification or "regression" for regression tasks.
+
+    save_path: Path or str
+        Where to save the results
+
+    groups: pd.Series, default=None
+        If used, should be the same size as y and should indicate the groups of the samples.
 
-            predictions_dict[omic_name].loc[test_idx, f"Fold n°{i}"] = predictions
+    n_jobs_outer: int, default=1
+        Number of folds processed in parallel. Each worker holds a copy of the omic, so the peak memory grows
+        linearly with n_jobs_outer.
 
-            omics_selected_features[omic_name].append(list(X_train_std.columns[np.where(model.coef_.flatten())]))
-            i += 1
+    n_jobs_inner: int, default=None
+        Number of jobs used by the Lasso models. If None, -1 when n_jobs_outer is 1 and 1 otherwise.
+
+    inner_cv_n_repeats: int, default=2
+        Number of repeats of the inner 5-fold cross validation used to tune the Lasso models.
+
+    features_format: str, default="csv"
+        Format of the files of the features selected at each fold: "csv" or "parquet" (requires pyarrow or
+        fastparquet).
+    """
+    _check_features_format(features_format)
+    predictions_dict = {model: [] for model in train_data_dict.keys()}
+    omics_selected_features = {model: [] for model in train_data_dict.keys()}
+    train_data_dict = _to_float32(train_data_dict)
+    n_jobs_inner = _resolve_n_jobs_inner(n_jobs_outer, n_jobs_inner)
+    inner_splitter = _inner_cv(_task_callables(task_type), inner_cv_n_repeats)
+
+    for omic_name, X_omic in train_data_dict.items():
+        # Positions of the samples of the omic in y
+        y_rows = y.index.get_indexer(X_omic.index)
+        if (y_rows < 0).any():
+            missing = X_omic.index[y_rows < 0]
+            raise KeyError(f"{len(missing)} samples of the omic {omic_name} are not in y: {missing[:5].tolist()}")
+        # The folds work on the array of the omic and on row positions instead of pandas labels
+        X_named = _NamedArray(X=X_omic.to_numpy(), names=X_omic.columns, index=X_omic.index)
+        y_values = y.to_numpy()[y_rows]
+        print(f"Omic {omic_name}")
+        results = Parallel(n_jobs=n_jobs_outer, backend="loky", batch_size=1)(
+            delayed(_late_fusion_fold)(
+                i,
+                train,
+                test,
+                X_omic=X_named,
+                y_omic=y_values,
+                task_type=task_type,
+                n_splits=outer_splitter.get_n_splits(),
+                inner_splitter=inner_splitter,
+                n_jobs_inner=n_jobs_inner
+            )
+            for i, (train, test) in enumerate(outer_splitter.split(X_omic, y_values, groups=groups), 1)
+        )
+
+        for test, predictions, selected_features in results:
+            predictions_dict[omic_name].append((y_rows[test], predictions))
+            omics_selected_features[omic_name].append(selected_features)
 
     all_selected_features = []
     for j in range(outer_splitter.get_n_splits()):
@@ -510,10 +1444,13 @@ def late_fusion_lasso_cv(train_data_dict, y, outer_splitter, task_type, save_pat
         all_selected_features.append(fold_selected_features)
 
     for model, predictions in predictions_dict.items():
-        predictions_dict[model] = predictions.median(1)
+        predictions_dict[model] = _median_over_folds(predictions, y.index)
 
-    df_predictions = pd.DataFrame(pd.concat(predictions_dict.values(), axis=1))
-    df_predictions.columns = list(predictions_dict.keys())
+    df_predictions = pd.DataFrame(
+        data=np.column_stack([predictions.to_numpy() for predictions in predictions_dict.values()]),
+        index=y.index,
+        columns=list(predictions_dict.keys())
+    )
 
     stacked_df, weights = stacked_multi_omic(df_predictions, y, task_type)
     saving_path = Path(save_path, "Training CV", "LF Lasso")
@@ -527,7 +1464,9 @@ def late_fusion_lasso_cv(train_data_dict, y, outer_splitter, task_type, save_pat
         index=[f"Fold {i}" for i in range(outer_splitter.get_n_splits())]
     )
 
-    all_selected_features.to_csv(Path(save_path, "Training CV", "Selected Features LF Lasso.csv"))
+    _save_selected_features(
+        all_selected_features, Path(save_path, "Training CV", "Selected Features LF Lasso"), features_format
+    )
 
     weights.to_csv(Path(saving_path, "Associated weights.csv"))
     stacked_df.to_csv(Path(saving_path, "Stacked Generalization predictions.csv"))
@@ -544,7 +1483,13 @@ def multi_omic_stabl_cv_josh(
         stability_selection,
         task_type,
         save_path,
-        outer_groups=None
+        outer_groups=None,
+        n_jobs_outer=1,
+        n_jobs_inner=None,
+        omic_parallel=1,
+        dask_client=None,
+        inner_cv_n_repeats=2,
+        features_format="csv"
 ):
     """
 
@@ -573,6 +1518,33 @@ def multi_omic_stabl_cv_josh(
     outer_groups: pd.Series, default=None
         If used, should be the same size as y and should indicate the groups of the samples.
 
+    n_jobs_outer: int, default=1
+        Number of folds of the outer cross validation processed in parallel. Each worker holds a copy of the
+        data and fits its own models, so the peak memory grows linearly with n_jobs_outer.
+        The cores are split between the folds for the BLAS threads, see the STABL_BLAS_THREADS_PER_FOLD
+        environment variable to override it.
+
+    n_jobs_inner: int, default=None
+        Number of jobs used by STABL, stability selection and the Lasso models inside each fold. If None, 1 when
+        n_jobs_outer is different from 1 to avoid oversubscription; otherwise STABL and stability selection keep
+        their own n_jobs and the Lasso models use all the cores.
+
+    omic_parallel: int, default=1
+        Number of omics processed in parallel inside each fold. When different from 1, STABL and stability
+        selection run their bootstraps on a single core. Useful with many omics and more cores than bootstraps.
+
+    dask_client: dask.distributed.Client, default=None
+        If given, the folds of the outer cross validation are processed on the dask cluster instead of the local
+        loky workers, and n_jobs_outer is ignored. The data is scattered once to the workers; each worker still
+        holds a full copy of it, so the memory of the smallest worker bounds the size of the data.
+
+    inner_cv_n_repeats: int, default=2
+        Number of repeats of the inner 5-fold cross validation used to tune the Lasso models.
+
+    features_format: str, default="csv"
+        Format of the files of the features selected at each fold: "csv" or "parquet" (requires pyarrow or
+        fastparquet).
+
     Returns
     -------
 
@@ -587,263 +1559,40 @@ def multi_omic_stabl_cv_josh(
     ##################################################################
     
     
+    _check_features_format(features_format)
     os.makedirs(Path(save_path, "Training CV"), exist_ok=True) # Creates directories to store mode outputs
     #os.makedirs(Path(save_path, "Summary"), exist_ok=True)
     
     
     models = ["STABL", "SS 03", "SS 05", "SS 08", "EF Lasso"] # Specifies models. EF lasso = early fusion lasso
 
-    # Initializing the df containing the data of all omics
-    X_tot = pd.concat(data_dict.values(), axis="columns") # Concatanates all columns of the different dataframes
-    mask = X_tot.index # Subset the response by the indices in the combined training data
-    y = y[mask]
-    
-    predictions_dict = dict()
-    selected_features_dict = dict()
-
-    for model in models:
-        predictions_dict[model] = pd.DataFrame(data=None, index=y.index) # Initiates an empty dataframe for every model
-        selected_features_dict[model] = []
-        
-        
-    ##################################################################
-    # For testing within each iteration of the CV scheme
-    # iterable = outer_splitter.split(X_tot, y, groups=outer_groups)
-    # iterable_element = next(iterable)
-    # train = iterable_element[0]
-    # test = iterable_element[1]    
-    ##################################################################
-    
-    i = 1
-    for train, test in outer_splitter.split(X_tot, y, groups=outer_groups): 
-      # This is the cross-validation step that splits the data. 
-      # Note that it is performed on the total concatanated data! That means that although stabl-CV is performed per dataframe (below),
-      # The splits of the groups actually happens before this. What this means is that if an sample is missing entirely from a dataframe,
-      # all data from selected features is imputed and used to store a prediction on that individual. 
-      # In the event that the groups are unbalanced, it is possible that imputed values may be closer to the overrepresented group.
-      # In that case, the model could tend to predict the overrepresented group on samples that are entirely missing from an omic layer.
-      # The final model that generates predictions in each fold accounts for unbalanced groups. 
-        
-        if isinstance(outer_splitter, LeaveOneOut): ##** Added for LOO, 4 lines
-            print(f" Iteration {i} over {X_tot.shape[0]} ".center(80, '*'), "\n") #
-        else: #
-            print(f" Iteration {i} over {outer_splitter.get_n_splits()} ".center(80, '*'), "\n") # Added for LOO
-        train_idx, test_idx = y.iloc[train].index, y.iloc[test].index
-        
-
-        
-        
-        fold_selected_features = dict() # Assigns keys to the dictionary
-        for model in models:
-            fold_selected_features[model] = []
-
-
-        print(f"{len(train_idx)} train samples, {len(test_idx)} test samples")
-        
-        
-        
-        
-        ##################################################################
-        #data_dict.keys() # Look at the keys
-        #X_omic = data_dict['CyTOF'] # Retrieve one and assign it for testing
-        ##################################################################
-
-        for omic_name, X_omic in data_dict.items():
-          # Cross-validation that happens per dataframe
-          # This trains the stabl model and selects features for every CV fold
-            X_tmp: pd.DataFrame = X_omic.drop(index=test_idx, errors="ignore") # The colon here indicates 'type hinting' during variable assignment
-
-            # Preprocessing of X_tmp
-            X_tmp = remove_low_info_samples(X_tmp) # Removes samples with 'too many' NAs. By default this removes samples with all NAs
-            y_tmp = y.loc[X_tmp.index]
-
-            X_tmp_std = pd.DataFrame(
-                data=preprocessing.fit_transform(X_tmp),
-                index=X_tmp.index,
-                columns=preprocessing.get_feature_names_out()
-            )
-
-
-            # __STABL__
-            if task_type == "binary":
-                min_C = l1_min_c(X_tmp_std, y_tmp)
-                lambda_grid = np.linspace(min_C, min_C * 100, 10)
-                stabl.set_params(lambda_grid=lambda_grid)
-                stability_selection.set_params(lambda_grid=lambda_grid)
-
-            stabl.fit(X_tmp_std, y_tmp)
-            tmp_sel_features = list(stabl.get_feature_names_out())
-            fold_selected_features["STABL"].extend(tmp_sel_features)
-            
-            ##################################################################
-            # tmp_sel_features = random.choice([["TCRgdp.T_VDAC1_median"], []]) # Randomly 'selects' a feature
-            # fold_selected_features["STABL"].extend(tmp_sel_features)
-            ##################################################################
-
-            print(
-                f"STABL finished on {omic_name} ({X_tmp.shape[0]} samples);"
-                f" {len(tmp_sel_features)} features selected\n"
-            )
-
-
-
-
-            # __SS__
-            stability_selection.fit(X_tmp_std, y_tmp)
-            fold_selected_features["SS 03"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.3)) # Collect biomarkers for each omic and CV fold
-            fold_selected_features["SS 05"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.5))
-            fold_selected_features["SS 08"] += list(stability_selection.get_feature_names_out(new_hard_threshold=.8))
-            
-            ##################################################################
-            # fold_selected_features["SS 03"] += random.choice([["TCRgdp.T_VDAC1_median"], []])
-            # fold_selected_features["SS 05"] += random.choice([["TCRgdp.T_VDAC1_median"], []])
-            # fold_selected_features["SS 08"] += random.choice([["TCRgdp.T_VDAC1_median"], []])
-            ##################################################################
-
-        selected_features_dict["STABL"].append(fold_selected_features["STABL"]) # Add biomarkers for each CV fold
-        selected_features_dict[f"SS 03"].append(fold_selected_features["SS 03"])
-        selected_features_dict[f"SS 05"].append(fold_selected_features["SS 05"])
-        selected_features_dict[f"SS 08"].append(fold_selected_features["SS 08"])
-
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-        print(f"This fold: {len(fold_selected_features['STABL'])} features selected for STABL")
-        print(f"This fold: {len(fold_selected_features['SS 03'])} features selected for SS 03")
-        print(f"This fold: {len(fold_selected_features['SS 05'])} features selected for SS 05")
-        print(f"This fold: {len(fold_selected_features['SS 08'])} features selected for SS 08")
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\n")
-        
-        
-        ##################################################################
-        #model = "STABL"
-        ##################################################################
-
-        for model in ["STABL", "SS 03", "SS 05", "SS 08"]:
-            ##################################################################
-            # sample_features = X_tot.columns[:10]
-            # X_train = X_tot.loc[train_idx, sample_features] # Subset features for testing!
-            # X_test = X_tot.loc[test_idx, sample_features] # Subset features for testing!
-            ##################################################################
-          
-            
-            X_train = X_tot.loc[train_idx, fold_selected_features[model]] # Subsets the selected features from both the training and test data
-            # 1. Note that the features are selected above while removing low info samples. But then the model is fit to all samples to evaluate CV.
-            # 2. Also note that the fit_transform step occurs after imputation, obviously
-            X_test = X_tot.loc[test_idx, fold_selected_features[model]] # Retains multi-omic features
-            y_train, y_test = y.loc[train_idx], y.loc[test_idx] # Run until here to test functions within each iteration (it generates splits of the data)
-            
-            
-
-
-
-
-            if len(fold_selected_features[model]) > 0:
-                # Standardization
-                std_pipe = Pipeline(
-                    steps=[
-                        ('imputer', SimpleImputer(strategy="median")),
-                        ('std', StandardScaler())
-                    ]
-                )
-
-                X_train = pd.DataFrame(
-                    data=std_pipe.fit_transform(X_train),
-                    index=X_train.index,
-                    columns=X_train.columns
-                )
-                X_test = pd.DataFrame(
-                    data=std_pipe.transform(X_test),
-                    index=X_test.index,
-                    columns=X_test.columns
-                )
-
-                # __Final Models__
-                if task_type == "binary":
-                    #predictions = clone(logit).fit(X_train, y_train).predict_proba(X_test)[:, 1].flatten() #Default parameter is class_weight='balanced',
-                    # which handles imbalanced data by assigning higher weights
-                    
-                    ##################################################################
-                    # Generate predictions with Lasso instead of normal logit
-                    # Add here predictions generated by a Logistic regression lasso
-                    inner_splitter = RepeatedStratifiedKFold(n_splits=5, n_repeats=5, random_state=42) # StratifiedKFold ensures that each fold of the dataset has the same proportion of observations with a given categorical label
-                    model_lasso = clone(logit_lasso_cv).set_params(cv=inner_splitter)
-                    predictions = model_lasso.fit(X_train, y_train).predict_proba(X_test)[:, 1].flatten()
-                    # Collect features. Create new key in dataframe if it doesnt already exist
-                    features_binary_lasso = list(X_train.columns[np.where(model_lasso.coef_.flatten())])
-                    # model.coef_.flatten() # coefs, in case I need them.
-                    if "Stabl_binary_lasso" not in selected_features_dict and model == "STABL": # create new dictionary for lasso features, but only for Stabl model
-                      selected_features_dict["Stabl_binary_lasso"] = [] # Create new key
-                      selected_features_dict["Stabl_binary_lasso"].append(features_binary_lasso)
-                    elif "Stabl_binary_lasso" in selected_features_dict and model == "STABL":
-                      selected_features_dict["Stabl_binary_lasso"].append(features_binary_lasso)
-                    else:
-                      pass
-                    ##################################################################
-                    
-
-
-                elif task_type == "regression":
-                    predictions = clone(linreg).fit(X_train, y_train).predict(X_test)
-
-                else:
-                    raise ValueError("task_type not recognized.")
-                
-                ##################################################################  
-                #i = 2 # testing
-                ##################################################################
-
-                predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = predictions
-
-
-
-            else: # If no features are selected, predict the intercept//0.5
-                if task_type == "binary":
-                    predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = [0.5] * len(test_idx)
-                    ##################################################################
-                    # In case no features are selected by Stabl, we still need add an entry to the dictionary
-                    if "Stabl_binary_lasso" not in selected_features_dict and model == "STABL":
-                      selected_features_dict["Stabl_binary_lasso"] = [] # Create new key
-                      selected_features_dict["Stabl_binary_lasso"].append([])
-                    elif "Stabl_binary_lasso" in selected_features_dict and model == "STABL":
-                      selected_features_dict["Stabl_binary_lasso"].append([])
-                    else:
-                      pass
-                    ##################################################################
-
-                elif task_type == "regression":
-                    predictions_dict[model].loc[test_idx, f'Fold n°{i}'] = [np.mean(y_train)] * len(test_idx)
-
-                else:
-                    raise ValueError("task_type not recognized.")
-        
-        
-        # __EF Lasso__
-        X_train = X_tot.loc[train_idx]
-        X_test = X_tot.loc[test_idx]
-        X_train = pd.DataFrame(
-            data=preprocessing.fit_transform(X_train),
-            columns=preprocessing.get_feature_names_out(),
-            index=X_train.index
-        )
-
-        X_test = pd.DataFrame(
-            data=preprocessing.transform(X_test),
-            columns=preprocessing.get_feature_names_out(),
-            index=X_test.index
-        )
-
-        if task_type == "binary":
-            inner_splitter = RepeatedStratifiedKFold(n_splits=5, n_repeats=5, random_state=42)
-            model = clone(logit_lasso_cv).set_params(cv=inner_splitter)
-            predictions = model.fit(X_train, y_train).predict_proba(X_test)[:, 1]
-        else:
-            inner_splitter = RepeatedKFold(n_splits=5, n_repeats=5, random_state=42)
-            model = clone(lasso_cv).set_params(cv=inner_splitter)
-            predictions = model.fit(X_train, y_train).predict(X_test)
-            
-        selected_features_dict["EF Lasso"].append(list(X_train.columns[np.where(model.coef_.flatten())]))
-        predictions_dict["EF Lasso"].loc[test_idx, f"Fold n°{i}"] = predictions
-
-        i += 1
+    # Samples present in at least one omic
+    mask = functools.reduce(lambda a, b: a.union(b, sort=False), [X_omic.index for X_omic in data_dict.values()])
+    y = y[mask] # Subset the response by the indices in the combined training data
+
+    # This is the cross-validation step that splits the data.
+    # Note that it is performed on the total concatanated data! That means that although stabl-CV is performed per dataframe,
+    # The splits of the groups actually happens before this. What this means is that if an sample is missing entirely from a dataframe,
+    # all data from selected features is imputed and used to store a prediction on that individual.
+    # In the event that the groups are unbalanced, it is possible that imputed values may be closer to the overrepresented group.
+    # In that case, the model could tend to predict the overrepresented group on samples that are entirely missing from an omic layer.
+    # The final model that generates predictions in each fold accounts for unbalanced groups.
+    # In the binary case the final models are Lasso models, the features kept on top of STABL are stored as "Stabl_binary_lasso"
+    predictions_dict, selected_features_dict = _run_outer_cv(
+        data_dict=data_dict,
+        y=y,
+        outer_splitter=outer_splitter,
+        stabl=stabl,
+        stability_selection=stability_selection,
+        task_type=task_type,
+        outer_groups=outer_groups,
+        n_jobs_outer=n_jobs_outer,
+        n_jobs_inner=n_jobs_inner,
+        final_lasso=True,
+        omic_parallel=omic_parallel,
+        dask_client=dask_client,
+        inner_cv_n_repeats=inner_cv_n_repeats
+    )
 
     # __SAVING_RESULTS__
 
@@ -857,11 +1606,8 @@ def multi_omic_stabl_cv_josh(
     formatted_features_dict = dict()
     
     if "Stabl_binary_lasso" in selected_features_dict: # Create new key
-      models.append("Stabl_binary_lasso")
-      
-    else:
-      models = models   
-    
+        models.append("Stabl_binary_lasso")
+
     #################################################################
     #model = "Stabl_binary_lasso"
     #model = "STABL"
@@ -872,37 +1618,22 @@ def multi_omic_stabl_cv_josh(
         jaccard_matrix_dict[model] = jaccard_matrix(selected_features_dict[model]) # Calculates similarity of CV folds based on the selected features
         # Selected features at each Stabl Run
         # selected_features_dict[model][1]
-        
-        
-        # Update for LOO
-        if isinstance(outer_splitter, LeaveOneOut):
-            
-            formatted_features_dict[model] = pd.DataFrame(
-                        data={
-                            "Fold selected features": selected_features_dict[model],
-                            "Fold nb of features": [len(el) for el in selected_features_dict[model]]
-                        },
-                        ##################################################################
-                        #index=[f"Fold {i}" for i in range(2)] # testing on two iterations
-                        ##################################################################
-                        index=[f"Fold {i}" for i in range(X_tot.shape[0])]
-                    )
-    
-        elif not isinstance(outer_splitter, LeaveOneOut):
-            formatted_features_dict[model] = pd.DataFrame(
-                        data={
-                            "Fold selected features": selected_features_dict[model],
-                            "Fold nb of features": [len(el) for el in selected_features_dict[model]]
-                        },
-                        index=[f"Fold {i}" for i in range(outer_splitter.get_n_splits())]
-                    )
-        #End up update
 
-        formatted_features_dict[model].to_csv(Path(cv_res_path, f"Selected Features {model}.csv"))
+        # One row per fold, also valid for LOO
+        formatted_features_dict[model] = pd.DataFrame(
+                    data={
+                        "Fold selected features": selected_features_dict[model],
+                        "Fold nb of features": [len(el) for el in selected_features_dict[model]]
+                    },
+                    index=[f"Fold {i}" for i in range(len(selected_features_dict[model]))]
+                )
+
+        _save_selected_features(
+            formatted_features_dict[model], Path(cv_res_path, f"Selected Features {model}"), features_format
+        )
         # Add code here that parses the final STABL lasso outputs, providing selected features and coefficients
     
-    predictions_dict = {model: predictions_dict[model].median(axis=1) for model in predictions_dict.keys()} # Generates predictions dictionary.
-    # This is specifically designed for GroupShuffleSplit, such that it takes the median prediction across CV folds
+    # predictions_dict holds the median prediction across CV folds. This is specifically designed for GroupShuffleSplit
     # If the CV scheme is LOO, you only get one prediction per fold. Then this essentially collapses the predictions into one column
 
     table_of_scores = compute_scores_table_multiomic( # This function only creates summary statistics of the predictions without directly delivering predictions
@@ -923,5 +1654,3 @@ def multi_omic_stabl_cv_josh(
     )
 
     return predictions_dict
-  
-  
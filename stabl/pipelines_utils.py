@@ -88,6 +88,33 @@ def save_plots(predictions_dict, y, task_type, save_path):
             )
 
 
+def _folds_stability(selected_features_dict, models):
+    """Computes once, for each model, the number of features selected at each fold and the Jaccard similarities
+    between the pairs of folds, which are then reused for all the comparisons of the table of scores.
+
+    Parameters
+    ----------
+    selected_features_dict: dict
+        Dictionary of DataFrames with the "Fold selected features" and "Fold nb of features" columns.
+
+    models: iterable
+        Models for which the stability is needed.
+
+    Returns
+    -------
+    folds_stability: dict
+        Dictionary of (number of features at each fold, Jaccard similarities between the folds) tuples.
+    """
+    folds_stability = dict()
+    for model in models:
+        jaccard_mat = jaccard_matrix(selected_features_dict[model]["Fold selected features"], remove_diag=False)
+        folds_stability[model] = (
+            np.asarray(selected_features_dict[model]["Fold nb of features"]),
+            jaccard_mat[np.triu_indices_from(jaccard_mat, k=1)]
+        )
+    return folds_stability
+
+
 def compute_scores_table(
         stabl_names, # Updated for multiple iterations of STABL
         predictions_dict,
@@ -131,6 +158,8 @@ def compute_scores_table(
             scores_columns = ["R2", "RMSE", "MAE"]
 
     table_of_scores = pd.DataFrame(data=None, columns=scores_columns)
+    if selected_features_dict is not None:
+        folds_stability = _folds_stability(selected_features_dict, dict.fromkeys([*stabl_names, *predictions_dict]))
 
     for model, preds in predictions_dict.items():
         stabl_preds = predictions_dict[stabl_names[0]] # New pipeline
@@ -168,9 +197,7 @@ def compute_scores_table(
 
         if selected_features_dict is not None:
             for stabl in stabl_names: # New pipeline : required to loop over the several STABL models (there used to be only one)
-                sel_features_stabl = selected_features_dict[stabl]["Fold nb of features"]
-                jaccard_mat_stabl = jaccard_matrix(selected_features_dict[stabl]["Fold selected features"], remove_diag=False)
-                jaccard_val_stabl = jaccard_mat_stabl[np.triu_indices_from(jaccard_mat_stabl, k=1)]
+                sel_features_stabl, jaccard_val_stabl = folds_stability[stabl]
     
                 median_features = np.median(sel_features_stabl)
                 iqr_features = np.quantile(sel_features_stabl, [.25, .75])
@@ -183,9 +210,7 @@ def compute_scores_table(
                 table_of_scores.loc[stabl, "CVS"] = cell_value
 
             if not model in stabl_names: # New pipeline : used to be "if model != 'STABL':"
-                sel_features = selected_features_dict[model]["Fold nb of features"]
-                jaccard_mat = jaccard_matrix(selected_features_dict[model]["Fold selected features"], remove_diag=False)
-                jaccard_val = jaccard_mat[np.triu_indices_from(jaccard_mat, k=1)]
+                sel_features, jaccard_val = folds_stability[model]
                 p_value_feature = mannwhitneyu(x=sel_features, y=sel_features_stabl).pvalue
                 p_value_feature = f" (p={p_value_feature:.3e})"
                 p_value_cvs = mannwhitneyu(x=jaccard_val, y=jaccard_val_stabl).pvalue
@@ -339,6 +364,8 @@ def compute_scores_table_multiomic(
             scores_columns = ["R2", "RMSE", "MAE"]
 
     table_of_scores = pd.DataFrame(data=None, columns=scores_columns)
+    if selected_features_dict is not None:
+        folds_stability = _folds_stability(selected_features_dict, predictions_dict)
 
     for model, preds in predictions_dict.items():
         stabl_preds = predictions_dict["STABL"]
@@ -374,9 +401,7 @@ def compute_scores_table_multiomic(
             table_of_scores.loc[model, "MAE"] = f"{model_mae:.3f} [{model_mae_CI[0]:.3f}, {model_mae_CI[1]:.3f}]"
 
         if selected_features_dict is not None:
-            sel_features_stabl = selected_features_dict["STABL"]["Fold nb of features"]
-            jaccard_mat_stabl = jaccard_matrix(selected_features_dict["STABL"]["Fold selected features"], remove_diag=False)
-            jaccard_val_stabl = jaccard_mat_stabl[np.triu_indices_from(jaccard_mat_stabl, k=1)]
+            sel_features_stabl, jaccard_val_stabl = folds_stability["STABL"]
 
             median_features = np.median(sel_features_stabl)
             iqr_features = np.quantile(sel_features_stabl, [.25, .75])
@@ -389,9 +414,7 @@ def compute_scores_table_multiomic(
             table_of_scores.loc["STABL", "CVS"] = cell_value
 
             if model != "STABL":
-                sel_features = selected_features_dict[model]["Fold nb of features"]
-                jaccard_mat = jaccard_matrix(selected_features_dict[model]["Fold selected features"], remove_diag=False)
-                jaccard_val = jaccard_mat[np.triu_indices_from(jaccard_mat, k=1)]
+                sel_features, jaccard_val = folds_stability[model]
                 p_value_feature = mannwhitneyu(x=sel_features, y=sel_features_stabl).pvalue
                 p_value_feature = f" (p={p_value_feature:.3e})"
                 p_value_cvs = mannwhitneyu(x=jaccard_val, y=jaccard_val_stabl).pvalue
@@ -1,7 +1,9 @@
+import warnings
+
 import numpy as np
-from sklearn.base import BaseEstimator
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.feature_selection import SelectorMixin
-from sklearn.utils.validation import check_is_fitted
+from sklearn.utils.validation import check_is_fitted, _check_feature_names_in
 
 
 def remove_low_info_samples(X, threshold=1.0):
@@ -91,7 +93,7 @@ class LowInfoFilter(SelectorMixin, BaseEstimator):
         X = self._validate_data(
             X,
             accept_sparse=("csr", "csc"),
-            dtype=np.float64,
+            dtype=[np.float64, np.float32],
             force_all_finite="allow-nan",
         )
 
@@ -131,3 +133,150 @@ class LowInfoFilter(SelectorMixin, BaseEstimator):
         # Useful to allow the use of nan values
         # For the transform function ;)
         return {"allow_nan": True}
+
+
+class MedianImputeScaler(TransformerMixin, BaseEstimator):
+    """Imputes the missing values of each feature with its median, then standardizes the features.
+
+    Equivalent to sklearn's SimpleImputer(strategy="median") followed by StandardScaler, fused into a single
+    transformer for dense numeric data: the medians are computed once with np.nanmedian, and the data is validated
+    once and imputed and scaled in the same float32 buffer.
+
+    Parameters
+    ----------
+    copy : bool, default=True
+        If False, the imputation and the scaling are done in place when the input is already a float32 array.
+
+    Attributes
+    ----------
+    statistics_ : array, shape (n_features,)
+        Median of each feature. Features with only nan values get a median of 0.
+
+    mean_ : array, shape (n_features,)
+        Mean of each feature after imputation.
+
+    scale_ : array, shape (n_features,)
+        Standard deviation of each feature after imputation, 1 for the constant features.
+
+    n_features_in_ : int
+        Number of features seen during fit.
+
+    feature_names_in_ : ndarray of shape (n_features_in_,)
+        Names of features seen during the fit. Defined only when X
+        has feature names that are all strings.
+
+    Notes
+    -----
+    Unlike SimpleImputer, features with only nan values are kept (filled with 0).
+    """
+
+    def __init__(self, copy=True):
+        self.copy = copy
+
+    def fit(self, X, y=None):
+        """Learn the median, mean and standard deviation of each feature.
+
+        Parameters
+        ----------
+        X : array-like, shape (n_samples, n_features)
+            Data from which to compute the statistics.
+
+        y : any, default=None
+            Ignored. This parameter exists only for compatibility with
+            sklearn.pipeline.Pipeline.
+
+        Returns
+        -------
+        self : object
+            Returns the instance itself.
+        """
+        self._fit_transform(X, copy=True)
+        return self
+
+    def fit_transform(self, X, y=None):
+        """Learn the statistics of each feature, then impute and standardize X.
+
+        Parameters
+        ----------
+        X : array-like, shape (n_samples, n_features)
+            Data to fit and transform.
+
+        y : any, default=None
+            Ignored. This parameter exists only for compatibility with
+            sklearn.pipeline.Pipeline.
+
+        Returns
+        -------
+        X_std : array, shape (n_samples, n_features)
+            Imputed and standardized float32 data.
+        """
+        return self._fit_transform(X, copy=self.copy)
+
+    def _fit_transform(self, X, copy):
+        X = self._validate_data(X, dtype=np.float32, force_all_finite="allow-nan", copy=copy)
+
+        with warnings.catch_warnings():
+            # Features with only nan values
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            statistics = np.nanmedian(X, axis=0)
+        statistics[np.isnan(statistics)] = 0
+        self.statistics_ = statistics
+
+        nan_rows, nan_cols = np.nonzero(np.isnan(X))
+        X[nan_rows, nan_cols] = statistics[nan_cols]
+
+        # Accumulated in float64 as in StandardScaler
+        n_samples = X.shape[0]
+        mean = X.mean(axis=0, dtype=np.float64)
+        var = X.var(axis=0, dtype=np.float64)
+        eps = np.finfo(np.float64).eps
+        constant = var <= n_samples * eps * var + (n_samples * mean * eps) ** 2
+        scale = np.sqrt(var)
+        scale[constant] = 1.
+        self.mean_, self.scale_ = mean, scale
+
+        X -= mean
+        X /= scale
+        return X
+
+    def transform(self, X):
+        """Impute and standardize X.
+
+        Parameters
+        ----------
+        X : array-like, shape (n_samples, n_features)
+            Data to transform.
+
+        Returns
+        -------
+        X_std : array, shape (n_samples, n_features)
+            Imputed and standardized float32 data.
+        """
+        check_is_fitted(self, "statistics_")
+        X = self._validate_data(X, dtype=np.float32, force_all_finite="allow-nan", copy=self.copy, reset=False)
+
+        nan_rows, nan_cols = np.nonzero(np.isnan(X))
+        X[nan_rows, nan_cols] = self.statistics_[nan_cols]
+        X -= self.mean_
+        X /= self.scale_
+
+        return X
+
+    def get_feature_names_out(self, input_features=None):
+        """Get output feature names for transformation.
+
+        Parameters
+        ----------
+        input_features : array-like of str or None, default=None
+            Input features.
+
+        Returns
+        -------
+        feature_names_out : ndarray of str objects
+            Same as the input features.
+        """
+        check_is_fitted(self, "statistics_")
+        return _check_feature_names_in(self, input_features)
+
+    def _more_tags(self):
+        return {"allow_nan": True}
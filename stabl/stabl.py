@@ -1,26 +1,38 @@
+import hashlib
+import numbers
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from warnings import warn
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from joblib import Parallel, delayed
-from knockpy.knockoffs import GaussianSampler
+from scipy.sparse import issparse
 from sklearn.base import BaseEstimator, clone
 from sklearn.feature_selection import SelectorMixin, SelectFromModel
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import ElasticNet, LogisticRegression
 from sklearn.utils import safe_mask
 from sklearn.utils.class_weight import compute_sample_weight
+from sklearn.utils.multiclass import type_of_target
 from sklearn.utils.validation import _check_feature_names_in, check_is_fitted
 from tqdm import tqdm
 
-from .visualization import boxplot_features, scatterplot_features
 
-
-def classic_bootstrap(y, n_subsamples, replace=True, class_weight=None, rng=np.random.default_rng(None)):
+def classic_bootstrap(
+        y,
+        n_subsamples,
+        replace=True,
+        class_weight=None,
+        rng=np.random.default_rng(None),
+        classes=None
+):
     """Function to create a bootstrap sample from the original dataset.
     Weights can be used to make some samples more likely to be selected.
+    For binary outcomes, the bootstrap is stratified: each class is sampled
+    separately, in proportion to its sampling probability, so that both classes
+    are always present in the sample.
 
     Parameters
     ----------
@@ -46,6 +58,10 @@ def classic_bootstrap(y, n_subsamples, replace=True, class_weight=None, rng=np.r
     rng: np.random.default_rng, default=np.random.default_rng(None)
         RandomState generator
 
+    classes: tuple or None, default=None
+        Encoding of the classes of y, as returned by `_bootstrap_classes`.
+        Computed once by `_bootstrap_generator` for all the bootstraps, computed here if None.
+
     Returns
     -------
     sampled_indices : array-like, shape(n_subsamples, )
@@ -66,26 +82,81 @@ def classic_bootstrap(y, n_subsamples, replace=True, class_weight=None, rng=np.r
     else:
         sampling_probs = None
 
-    sampled_indices = rng.choice(
-        a=n_samples,
-        size=n_subsamples,
-        replace=replace,
-        p=sampling_probs
-    )
-
-    # Handling the case of binary classification where we only select one class
-    if len(np.unique(y[sampled_indices])) < 2:
-        sampled_indices = classic_bootstrap(
-            y,
-            n_subsamples,
-            replace=replace,
-            class_weight=class_weight,
-            rng=rng
-        )
+    if classes is None:
+        classes = _bootstrap_classes(y)
+    y_encoded, classes_indices = classes
+
+    if len(classes_indices) != 2:
+        while True:
+            sampled_indices = rng.choice(
+                a=n_samples,
+                size=n_subsamples,
+                replace=replace,
+                p=sampling_probs
+            )
+            # Multiclass outcomes: drawing again in the rare case where a single class is sampled,
+            # checked in one pass with min/max on the class codes
+            if y_encoded is None or n_subsamples < 2:
+                return sampled_indices
+            y_sampled = y_encoded[sampled_indices]
+            if y_sampled.min() != y_sampled.max():
+                return sampled_indices
+
+    # Binary classification: stratified draw so that both classes are always sampled.
+    # The sample weights are constant within a class, so each class is sampled uniformly.
+    if sampling_probs is None:
+        first_class_prob = len(classes_indices[0]) / n_samples
+    else:
+        first_class_prob = sampling_probs[classes_indices[0]].sum()
+
+    n_first = int(np.clip(np.rint(first_class_prob * n_subsamples), 1, n_subsamples - 1))
+    if not replace:
+        n_first = int(np.clip(n_first, n_subsamples - len(classes_indices[1]), len(classes_indices[0])))
+    n_drawn = (n_first, n_subsamples - n_first)
+
+    if replace:
+        sampled_indices = np.concatenate([
+            class_indices[rng.integers(0, len(class_indices), size=n)]
+            for class_indices, n in zip(classes_indices, n_drawn)
+        ])
+    else:
+        sampled_indices = np.concatenate([
+            rng.choice(class_indices, size=n, replace=False)
+            for class_indices, n in zip(classes_indices, n_drawn)
+        ])
+    rng.shuffle(sampled_indices)
 
     return sampled_indices
 
 
+def _bootstrap_classes(y):
+    """Encoding of the classes of y used by `classic_bootstrap`.
+
+    Parameters
+    ----------
+    y : array-like, shape(n_repeats, )
+        The outcome array for classification or regression
+
+    Returns
+    -------
+    y_encoded : array or None
+        Code of the class of each sample. None for a continuous or single class outcome,
+        whose bootstraps are not checked.
+
+    classes_indices : list of array
+        Indices of the samples of each class for a binary outcome, empty otherwise.
+    """
+    if type_of_target(y) not in ("binary", "multiclass"):
+        return None, []
+
+    classes, y_encoded = np.unique(y, return_inverse=True)
+    if len(classes) < 2:
+        return None, []
+    if len(classes) > 2:
+        return y_encoded, []
+    return y_encoded, [np.flatnonzero(y_encoded == 0), np.flatnonzero(y_encoded == 1)]
+
+
 def _bootstrap_generator(
         n_bootstraps,
         bootstrap_func,
@@ -128,6 +199,10 @@ def _bootstrap_generator(
         Further arguments we want to pass to bootstrap_func.
     """
     rng = np.random.default_rng(random_state)
+    if bootstrap_func is classic_bootstrap:
+        # The classes of y are encoded once for all the bootstraps
+        kwargs.setdefault("classes", _bootstrap_classes(y))
+
     for _ in range(n_bootstraps):
 
         # Generating the bootstrapped indices
@@ -177,7 +252,7 @@ def export_stabl_to_csv(stabl, path):
     df_real.to_csv(Path(path, 'STABL scores.csv'))
 
     df_max_probs = pd.DataFrame(
-        data={"Max Proba": stabl.stabl_scores_.max(axis=1)},
+        data={"Max Proba": stabl.max_scores_},
         index=X_columns
     )
     df_max_probs = df_max_probs.sort_values(by='Max Proba', ascending=False)
@@ -194,7 +269,7 @@ def export_stabl_to_csv(stabl, path):
         df_noise.to_csv(Path(path, 'STABL artificial scores.csv'))
 
         df_max_probs_noise = pd.DataFrame(
-            data={"Max Proba": stabl.stabl_scores_artificial_.max(axis=1)},
+            data={"Max Proba": stabl.max_scores_artificial_},
             index=synthetic_index
         )
         df_max_probs_noise = df_max_probs_noise.sort_values(by='Max Proba', ascending=False)
@@ -234,6 +309,8 @@ def plot_fdr_graph(
     figure, axis
     """
 
+    import matplotlib.pyplot as plt
+
     check_is_fitted(stabl, 'stabl_scores_')
 
     fig, ax = plt.subplots(1, 1, figsize=figsize)
@@ -305,6 +382,8 @@ def plot_stabl_path(
     figure, axis
     """
 
+    import matplotlib.pyplot as plt
+
     check_is_fitted(stabl, 'stabl_scores_')
 
     threshold = stabl.hard_threshold if new_hard_threshold is None else new_hard_threshold
@@ -324,24 +403,24 @@ def plot_stabl_path(
     fig, ax = plt.subplots(1, 1, figsize=figsize)
 
     if not paths_to_highlight.all():
-        ax.plot(
+        ax.add_collection(_paths_collection(
             x_grid,
-            stabl.stabl_scores_[~paths_to_highlight].T,
+            stabl.stabl_scores_[~paths_to_highlight],
             alpha=1,
             lw=1.5,
             color="#4D4F53",
             label="Noisy features"
-        )
+        ))
 
     if paths_to_highlight.any():
-        ax.plot(
+        ax.add_collection(_paths_collection(
             x_grid,
-            stabl.stabl_scores_[paths_to_highlight].T,
+            stabl.stabl_scores_[paths_to_highlight],
             alpha=1,
             lw=2,
             color="#C41E3A",
             label="Stable features"
-        )
+        ))
 
     if threshold is not None:
         ax.plot(
@@ -353,15 +432,15 @@ def plot_stabl_path(
         )
 
     if stabl.artificial_type is not None:
-        ax.plot(
+        ax.add_collection(_paths_collection(
             x_grid,
-            stabl.stabl_scores_artificial_.T,
+            stabl.stabl_scores_artificial_,
             color="gray",
             ls=":",
             alpha=.4,
             lw=1,
             label="Artificial features"
-        )
+        ))
 
     if stabl.artificial_type is not None and threshold is None:
         ax.plot(
@@ -372,6 +451,7 @@ def plot_stabl_path(
             label=f"FDRc threshold={stabl.fdr_min_threshold_: .2f}"
         )
 
+    ax.autoscale_view()
     ax.tick_params(left=True, right=False, labelleft=True, labelbottom=False, bottom=False)
     ax.set_xlabel(r"$\lambda$")
     ax.set_ylabel(f"Frequency of selection")
@@ -395,6 +475,15 @@ def plot_stabl_path(
     return fig, ax
 
 
+def _paths_collection(x_grid, scores, **kwargs):
+    """Single LineCollection drawing the stability path of every feature (row of `scores`)."""
+    from matplotlib.collections import LineCollection
+
+    segments = np.stack([np.broadcast_to(x_grid, scores.shape), scores], axis=-1)
+    # Same layer as the lines drawn with ax.plot, so that the drawing order is kept
+    return LineCollection(segments, zorder=2, **kwargs)
+
+
 def save_stabl_results(
         stabl,
         path,
@@ -436,6 +525,8 @@ def save_stabl_results(
         Choose "binary" for binary classification and "regression" for regression tasks.
     """
 
+    from .visualization import boxplot_features, scatterplot_features
+
     check_is_fitted(stabl)
 
     path = Path(path, '')
@@ -508,7 +599,8 @@ def fit_bootstrapped_sample(
         lambda_name,
         lambda_value,
         threshold=None,
-        random_state=None
+        random_state=None,
+        subsample_indices=None
 ):
     """
     Fits base_estimator on a bootstrap sample of the original data,
@@ -517,7 +609,8 @@ def fit_bootstrapped_sample(
     Parameters
     ----------
     base_estimator: estimator
-        This is the estimator to be fitted on the data
+        This is the estimator to be fitted on the data.
+        It is cloned before fitting, the instance passed is left unchanged.
 
     X: {array-like, sparse matrix}, shape = [n_repeats, n_features]
         The training input samples.
@@ -541,23 +634,400 @@ def fit_bootstrapped_sample(
         or implicitly (e.g, Lasso), the hard_threshold used is 1e-5.
         Otherwise, "mean" is used by default.
 
+    subsample_indices: array-like or None, default=None
+        Indices of the bootstrap sample. If set, X and y are the full data
+        and the bootstrap sample is taken here, in the worker.
+
     Returns
     -------
-    selected_variables: array-like, shape=(n_features, )
-        Boolean mask of the selected variables.
+    selected_variables: array-like, shape=(n_selected_features, )
+        Indices of the selected variables.
     """
     np.random.RandomState(seed=random_state)
 
-    base_estimator.set_params(**{lambda_name: lambda_value})
+    if subsample_indices is not None:
+        X = _take_rows(X, subsample_indices)
+        y = y[subsample_indices]
+
+    base_estimator = clone(base_estimator).set_params(**{lambda_name: lambda_value})
     base_estimator.fit(X, y)
 
-    features_selection = SelectFromModel(
-        estimator=base_estimator,
-        threshold=threshold,
-        prefit=True
+    return _selected_indices(base_estimator, threshold)
+
+
+def fit_bootstrapped_path(
+        base_estimator,
+        X,
+        y,
+        lambda_name,
+        lambda_grid,
+        threshold=None,
+        subsample_indices=None
+):
+    """
+    Fits base_estimator on a bootstrap sample of the original data for every
+    value of the penalization parameter, and returns the variables selected
+    at each value.
+
+    The grid is visited from the most to the least penalized model and, when
+    the estimator supports it (``warm_start`` parameter), each fit starts from
+    the solution of the previous one. The warm-started solutions match the cold-started
+    ones only within the solver tolerance (``tol``): coefficients close to the threshold
+    can be selected differently, which slightly changes some stability scores.
+
+    Parameters
+    ----------
+    base_estimator: estimator
+        This is the estimator to be fitted on the data.
+        It is cloned before fitting, the instance passed is left unchanged.
+
+    X: {array-like, sparse matrix}, shape = [n_repeats, n_features]
+        The training input samples.
+
+    y: array-like, shape = [n_repeats]
+        The target values.
+
+    lambda_name: str
+        Name of the penalization parameter of base_estimator
+
+    lambda_grid: array-like
+        Values of the penalization parameter
+
+    threshold: string or float, default=None
+        The hard_threshold value to use for feature selection.
+        See `fit_bootstrapped_sample`.
+
+    subsample_indices: array-like or None, default=None
+        Indices of the bootstrap sample. If set, X and y are the full data
+        and the bootstrap sample is taken here, in the worker.
+
+    Returns
+    -------
+    selected_variables: list of array-like
+        Selected variables for each value of `lambda_grid`, in the grid order. Each selection is
+        either a packed boolean mask (uint8) or the indices of the selected variables, whichever is smaller.
+    """
+    base_estimator = clone(base_estimator)
+    params = base_estimator.get_params()
+    if "warm_start" in params:
+        base_estimator.set_params(warm_start=True)
+
+    # The bootstrap sample is a private copy: it is laid out once for the coordinate descent
+    # solvers, which then center it in place instead of copying it at each fit
+    in_place = subsample_indices is not None and params.get("copy_X", False)
+    if in_place:
+        base_estimator.set_params(copy_X=False)
+
+    if subsample_indices is not None:
+        X = _take_rows(X, subsample_indices, order="F" if in_place else "C")
+        y = y[subsample_indices]
+
+    selected_variables = [None] * len(lambda_grid)
+    for idx in _path_order(lambda_name, lambda_grid):
+        base_estimator.set_params(**{lambda_name: lambda_grid[idx]})
+        base_estimator.fit(X, y)
+        selected_variables[idx] = _encode_support(_selected_support(base_estimator, threshold))
+
+    return selected_variables
+
+
+def _default_backend(base_estimator):
+    """Joblib backend of the bootstrap fits when `backend_multi` is None.
+
+    The liblinear, sag/saga and coordinate descent solvers release the GIL: threads share X
+    without pickling or memory mapping, and scale as well as processes.
+    """
+    if isinstance(base_estimator, LogisticRegression) and base_estimator.solver in ("liblinear", "sag", "saga"):
+        return "threading"
+    if isinstance(base_estimator, ElasticNet):
+        return "threading"
+    return None
+
+
+# Scratch buffers of the bootstrap samples, reused by the successive tasks of a worker thread
+_worker_buffers = threading.local()
+
+
+def _scratch_buffer(shape, dtype, order):
+    """Returns the scratch buffer of the current thread with this shape, dtype and order."""
+    key = f"buffer_{order}"
+    buffer = getattr(_worker_buffers, key, None)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = np.empty(shape, dtype=dtype, order=order)
+        setattr(_worker_buffers, key, buffer)
+    return buffer
+
+
+def _take_rows(X, subsample_indices, order="C"):
+    """Rows of X of the bootstrap sample.
+
+    For dense X, the rows are written in a scratch buffer of the worker thread instead of a new
+    array at each bootstrap: the returned array is only valid until the next call in the same thread.
+    """
+    if issparse(X):
+        return X[safe_mask(X, subsample_indices), :]
+
+    subsample_indices = np.asarray(subsample_indices)
+    if subsample_indices.dtype == bool:
+        subsample_indices = np.flatnonzero(subsample_indices)
+
+    shape = (len(subsample_indices), X.shape[1])
+    X_sample = _scratch_buffer(shape, X.dtype, "C")
+    # Out of range indices raise an IndexError, as fancy indexing does
+    np.take(X, subsample_indices, axis=0, out=X_sample)
+
+    if order == "F":
+        # Direct take into a Fortran buffer is much slower than the transposing copy
+        X_sample_f = _scratch_buffer(shape, X.dtype, "F")
+        X_sample_f[...] = X_sample
+        X_sample = X_sample_f
+
+    return X_sample
+
+
+# Knockoffs of the last inputs fitted with a fixed random state
+_knockoffs_cache = OrderedDict()
+_KNOCKOFFS_CACHE_SIZE = 4
+
+
+def _gaussian_knockoffs(X, columns, rng, random_state=None):
+    """Gaussian knockoffs of the `columns` of X.
+
+    Fitting the Gaussian sampler is expensive and the same data is often fitted again
+    (several Stabl settings on the same fold): with an integer random_state, the knockoffs
+    of the last inputs are cached, keyed by the content of X and by the columns.
+
+    Parameters
+    ----------
+    X: array-like, shape=(n_samples, n_features)
+        Input data.
+
+    columns: array-like of int
+        Indices of the columns whose knockoffs are returned.
+
+    rng: np.random.Generator
+        Random generator used to sample the knockoffs.
+
+    random_state: int or None, default=None
+        Random state `rng` was created from. The knockoffs are cached only if it is an integer.
+
+    Returns
+    -------
+    X_knockoffs: array, shape=(n_samples, len(columns))
+        The knockoffs of the columns.
+    """
+    if not isinstance(random_state, numbers.Integral):
+        return _sample_gaussian_knockoffs(X, columns=columns, rng=rng)
+
+    X = np.ascontiguousarray(X)
+    columns = np.asarray(columns)
+    key = (
+        hashlib.blake2b(X.view(np.uint8), digest_size=16).hexdigest(),
+        X.shape,
+        X.dtype.str,
+        hashlib.blake2b(columns.tobytes(), digest_size=16).hexdigest(),
+        random_state
+    )
+    if key in _knockoffs_cache:
+        _knockoffs_cache.move_to_end(key)
+        return _knockoffs_cache[key]
+
+    X_knockoffs = _sample_gaussian_knockoffs(X, columns=columns, rng=rng)
+    X_knockoffs.setflags(write=False)
+    _knockoffs_cache[key] = X_knockoffs
+    if len(_knockoffs_cache) > _KNOCKOFFS_CACHE_SIZE:
+        _knockoffs_cache.popitem(last=False)
+
+    return X_knockoffs
+
+
+# Above this number of features, the knockoffs are sampled from a low-rank factor model of the
+# covariance instead of the dense (n_features, n_features) covariance
+_LOW_RANK_KNOCKOFFS_MIN_FEATURES = 2000
+_LOW_RANK_KNOCKOFFS_RANK = 10
+
+
+def _sample_gaussian_knockoffs(X, columns, rng):
+    """Samples Gaussian knockoffs of the `columns` of X, with knockpy's equicorrelated S matrix
+    for moderate numbers of features and with the low-rank factor model for wide X."""
+    n_samples, n_features = X.shape
+    if n_features < _LOW_RANK_KNOCKOFFS_MIN_FEATURES:
+        return _equicorrelated_gaussian_knockoffs(X, columns=columns, rng=rng)
+
+    rank = max(1, min(_LOW_RANK_KNOCKOFFS_RANK, n_samples - 1, n_features))
+    return _low_rank_gaussian_knockoffs(X, rank=rank, columns=columns, rng=rng)
+
+
+def _equicorrelated_gaussian_knockoffs(X, columns, rng, sample_tol=1e-5):
+    """Samples Gaussian knockoffs of the `columns` of X, with knockpy's covariance estimate
+    and equicorrelated S matrix.
+
+    Same distribution as `GaussianSampler(X, method='equicorrelated').sample_knockoffs()[:, columns]`,
+    but only the moments of the retained columns are computed: the (n_features, n_features)
+    products and the Cholesky decomposition of the full knockoff covariance are avoided.
+    """
+    from knockpy.knockoffs import GaussianSampler
+
+    sampler = GaussianSampler(X, method='equicorrelated')
+
+    S_columns = sampler.S[:, columns]
+    invSigma_S = sampler.invSigma @ S_columns
+    mean = X[:, columns] - (X - sampler.mu) @ invSigma_S
+    covariance = 2 * S_columns[columns] - S_columns.T @ invSigma_S
+
+    # Accounting for numerical errors, as knockpy does
+    min_eig = np.linalg.eigvalsh(covariance).min()
+    if min_eig < sample_tol:
+        covariance += (sample_tol - min_eig) * np.eye(len(columns))
+    L = np.linalg.cholesky(covariance)
+
+    # The noise only needs single precision: SGEMM with a float32 factor, added back to the float64 mean
+    noise = rng.standard_normal(mean.shape, dtype=np.float32) @ L.T.astype(np.float32)
+    return mean + noise
+
+
+def _low_rank_gaussian_knockoffs(X, rank, columns, rng, min_residual_variance=1e-2):
+    """Samples Gaussian knockoffs of the `columns` of X under a factor model of the correlation matrix.
+
+    The correlation matrix of X is modeled as Sigma = D + U U^T, with U the (n_features, rank)
+    loadings of the top singular vectors of the standardized X and D the diagonal residual
+    variances. With the knockoff matrix S = D (valid since D <= 2 Sigma), Woodbury's identity gives
+    the conditional distribution of the standardized knockoffs:
+
+        mean = (Z D^-1 U) M^-1 U^T,  covariance = D + U M^-1 U^T,  with M = I + U^T D^-1 U
+
+    which is sampled in O(n_samples * n_features * rank), without any (n_features, n_features) matrix.
+
+    Parameters
+    ----------
+    X: array-like, shape=(n_samples, n_features)
+        Input data.
+
+    rank: int
+        Number of factors of the model.
+
+    columns: array-like of int
+        Indices of the columns whose knockoffs are sampled.
+
+    rng: np.random.Generator
+        Random generator of the truncated SVD and of the sampling.
+
+    min_residual_variance: float, default=1e-2
+        Lower bound of the residual variances D, for the stability of D^-1.
+
+    Returns
+    -------
+    X_knockoffs: array, shape=(n_samples, len(columns))
+        The knockoffs, on the scale of X.
+    """
+    from sklearn.utils.extmath import randomized_svd
+
+    n_samples = X.shape[0]
+
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1.
+    Z = (X - mean) / std
+
+    _, singular_values, Vt = randomized_svd(Z, n_components=rank, random_state=rng.integers(2 ** 31))
+    U = Vt.T * (singular_values / np.sqrt(n_samples))
+    D = np.clip(1. - np.sum(U ** 2, axis=1), min_residual_variance, 1.)
+
+    M_inv = np.linalg.inv(np.eye(rank) + U.T @ (U / D[:, None]))
+    L = np.linalg.cholesky(M_inv)
+
+    U_columns = U[columns]
+    Z_knockoffs = (Z @ (U / D[:, None])) @ M_inv @ U_columns.T
+    # The noise is drawn in single precision, the mean stays in float64
+    Z_knockoffs += (
+        rng.standard_normal((n_samples, len(columns)), dtype=np.float32)
+        * np.sqrt(D[columns]).astype(np.float32)
     )
+    Z_knockoffs += rng.standard_normal((n_samples, rank), dtype=np.float32) @ (U_columns @ L).T.astype(np.float32)
+
+    return mean[columns] + std[columns] * Z_knockoffs
+
+
+def _path_order(lambda_name, lambda_grid):
+    """Order in which the lambda grid is visited, from the most to the least penalized model."""
+    if lambda_name == 'C':
+        return np.argsort(lambda_grid)
+    if lambda_name == 'alpha':
+        return np.argsort(lambda_grid)[::-1]
+    return np.arange(len(lambda_grid))
 
-    return features_selection.get_support()
+
+def _flat_selection_indices(selected_variables, n_features, n_lambdas):
+    """Flat indices, in a (n_features, n_lambdas) count array, of the selections of one bootstrap path.
+
+    Parameters
+    ----------
+    selected_variables: list of array-like
+        The selected features for each lambda, as returned by `fit_bootstrapped_path`.
+
+    n_features: int
+        Total number of features.
+
+    n_lambdas: int
+        Number of lambda values.
+
+    Returns
+    -------
+    flat_indices: array
+        Flat indices of the selected (feature, lambda) pairs, without duplicates.
+    """
+    selected_variables = [_decode_support(encoded, n_features) for encoded in selected_variables]
+    lambda_indices = np.repeat(np.arange(n_lambdas), [len(selected) for selected in selected_variables])
+    return np.concatenate(selected_variables).astype(np.intp) * n_lambdas + lambda_indices
+
+
+def _selected_indices(base_estimator, threshold):
+    """Indices of the features selected by a fitted estimator."""
+    return np.flatnonzero(_selected_support(base_estimator, threshold)).astype(np.int32)
+
+
+def _selected_support(base_estimator, threshold):
+    """Boolean mask of the features selected by a fitted estimator."""
+    coef = getattr(base_estimator, "coef_", None)
+    if coef is None or threshold is None or isinstance(threshold, str):
+        support = SelectFromModel(
+            estimator=base_estimator,
+            threshold=threshold,
+            prefit=True
+        ).get_support()
+
+    else:
+        # Same importances as SelectFromModel, without building the selector
+        importances = np.abs(coef) if coef.ndim == 1 else np.linalg.norm(coef, ord=1, axis=0)
+        support = importances >= threshold
+
+    return support
+
+
+def _encode_support(support):
+    """Compact encoding of a support mask, sent back by the bootstrap workers.
+
+    The mask is packed into a bitset (uint8) when it is smaller than the array of
+    the selected indices (uint16 when possible, int32 otherwise), which is the case
+    for dense selections. Sparse selections are sent as indices.
+    """
+    index_dtype = np.uint16 if len(support) <= np.iinfo(np.uint16).max + 1 else np.int32
+    selected_indices = np.flatnonzero(support)
+    if len(selected_indices) * np.dtype(index_dtype).itemsize > -(-len(support) // 8):
+        return np.packbits(support)
+    return selected_indices.astype(index_dtype)
+
+
+def _decode_support(encoded, n_features):
+    """Indices of the selected features from the output of `_encode_support`."""
+    if encoded.dtype == np.uint8:
+        return np.flatnonzero(np.unpackbits(encoded, count=n_features))
+    return encoded
+
+
+def _count_above(scores, thresholds):
+    """Number of scores strictly greater than each threshold."""
+    return len(scores) - np.searchsorted(np.sort(scores), thresholds, side='right')
 
 
 class Stabl(SelectorMixin, BaseEstimator):
@@ -575,6 +1045,12 @@ class Stabl(SelectorMixin, BaseEstimator):
         The base estimator used for stability selection. The estimator
         must have either a ``feature_importances_`` or ``coef_``
         attribute after fitting.
+        The whole lambda path is fitted on each bootstrap sample: estimators with a
+        ``warm_start`` parameter (e.g. Lasso, ElasticNet, or LogisticRegression with
+        the saga solver) start each fit from the previous solution and are much faster.
+        Warm starts converge to the cold-started solutions within the solver tolerance
+        (``tol``), so the stability scores can differ slightly from independent fits;
+        lower ``tol`` to reduce the gap.
 
     lambda_name: str, default='C'
         The name of the penalization parameter for the estimator
@@ -617,6 +1093,12 @@ class Stabl(SelectorMixin, BaseEstimator):
         or implicitly (e.g, Lasso), the hard_threshold used is 1e-5.
         Otherwise, "mean" is used by default.
 
+    backend_multi: str or None, default=None
+        Joblib backend used to fit the bootstraps in parallel.
+        If None, the threading backend is used for the estimators whose solver releases
+        the GIL (liblinear, sag and saga logistic regressions, coordinate descent linear models),
+        and joblib's default backend otherwise.
+
     verbose: int, default=0
         Controls the verbosity: the higher, the more messages.
 
@@ -635,14 +1117,21 @@ class Stabl(SelectorMixin, BaseEstimator):
         Names of features seen during fit. Defined only when X has feature names that are all strings.
 
     stabl_scores_: array, shape(n_features, n_alphas)
-        Array of stability scores for each feature and for each value of the
-        penalization parameter.
+        Array of stability scores (float32) for each feature and for each value of the
+        penalization parameter. C-contiguous: the scores of a feature over the grid are contiguous.
 
     stabl_scores_artificial_: array, shape(n_features, n_alphas)
-        Array of stability scores for each decoy/knockoff feature and for each value of the
+        Array of stability scores (float32) for each decoy/knockoff feature and for each value of the
         penalization parameter. Can only be accessed if we used decoy or knockoff in the
         training.
 
+    max_scores_: array, shape(n_features, )
+        Maximum stability score of each feature over the grid of the penalization parameter.
+
+    max_scores_artificial_: array, shape(n_features, )
+        Maximum stability score of each decoy/knockoff feature over the grid of the penalization
+        parameter. Can only be accessed if we used decoy or knockoff in the training.
+
     X_artificial_: array, shape(n_repeats, n_features)
         Array of synthetic features. Can only be returned if we used decoy or knockoffs in the
         training.
@@ -763,13 +1252,8 @@ class Stabl(SelectorMixin, BaseEstimator):
 
         base_estimator = clone(self.base_estimator)
 
-        # Initializing the Stabl scores
-        self.stabl_scores_ = np.zeros((n_features, n_lambdas))
-
         # __Synthetic features and coefs__
         if self.artificial_type is not None:
-            # Only initialize those score if we use artificial features
-            self.stabl_scores_artificial_ = np.zeros((n_injected_noise, n_lambdas))
             X = self._make_artificial_features(
                 X=X,
                 nb_noise=n_injected_noise,
@@ -777,51 +1261,70 @@ class Stabl(SelectorMixin, BaseEstimator):
                 random_state=self.random_state
             )
 
+        # Generating the bootstrap indices once, the same samples are used for every lambda
+        bootstrap_indices = list(_bootstrap_generator(
+            n_bootstraps=self.n_bootstraps,
+            bootstrap_func=self.bootstrap_func,
+            y=y,
+            n_subsamples=n_subsamples,
+            replace=self.replace,
+            class_weight=self.sample_weight_bootstrap,
+            random_state=self.random_state
+        ))
+
         # --Loop--
+        # A single parallel call over the bootstraps, each one fitting the whole lambda path.
+        # The full X is sent to the workers (memory mapped by joblib when large) and sliced there.
+        selected_paths = Parallel(
+            n_jobs=self.n_jobs,
+            verbose=0,
+            pre_dispatch='2*n_jobs',
+            batch_size='auto',
+            backend=self.backend_multi if self.backend_multi is not None else _default_backend(base_estimator),
+            mmap_mode='r',
+            return_as='generator_unordered'
+        )(delayed(fit_bootstrapped_path)(
+            base_estimator,
+            X=X,
+            y=y,
+            lambda_name=self.lambda_name,
+            lambda_grid=self.lambda_grid,
+            threshold=self.bootstrap_threshold,
+            subsample_indices=subsample_indices
+        )
+          for subsample_indices in bootstrap_indices
+          )
+
+        # Computing the frequencies: number of times each feature (original and artificial)
+        # is selected for each lambda, accumulated as the bootstraps complete. The (n_features, n_lambdas)
+        # C layout is kept until the end, so the per-feature reductions read contiguous rows
+        counts = np.zeros((X.shape[1], n_lambdas), dtype=np.int32)
+        counts_flat = counts.reshape(-1)
+        # The progress bar is updated by the parent once per completed bootstrap
         leave = (self.verbose > 0)
-        for idx, lambda_value in tqdm(
-                enumerate(self.lambda_grid),
-                'Stabl progress',
-                total=n_lambdas,
-                colour='#001A7B',
-                leave=leave,
-        ):
-
-            # Generating the bootstrap indices
-            bootstrap_indices = _bootstrap_generator(
-                n_bootstraps=self.n_bootstraps,
-                bootstrap_func=self.bootstrap_func,
-                y=y,
-                n_subsamples=n_subsamples,
-                replace=self.replace,
-                class_weight=self.sample_weight_bootstrap,
-                random_state=self.random_state
-            )
-
-            # Computing the frequencies
-            selected_variables = Parallel(
-                n_jobs=self.n_jobs,
-                verbose=0,
-                pre_dispatch='2*n_jobs',
-                backend=self.backend_multi
-            )(delayed(fit_bootstrapped_sample)(
-                clone(base_estimator),
-                X=X[safe_mask(X, subsample_indices), :],
-                y=y[subsample_indices],
-                lambda_name=self.lambda_name,
-                lambda_value=lambda_value,
-                threshold=self.bootstrap_threshold,
-                random_state=self.random_state
-            )
-              for subsample_indices in bootstrap_indices
-              )
+        progress = tqdm(
+            selected_paths,
+            'Stabl progress',
+            total=len(bootstrap_indices),
+            colour='#001A7B',
+            leave=leave
+        )
+        for selected_variables in progress:
+            # No duplicates within a bootstrap path: the fancy increment counts each pair once
+            counts_flat[_flat_selection_indices(selected_variables, X.shape[1], n_lambdas)] += 1
 
-            if self.artificial_type is not None:
-                self.stabl_scores_artificial_[:, idx] = np.vstack(selected_variables)[:, n_features:].mean(axis=0)
-            self.stabl_scores_[:, idx] = np.vstack(selected_variables)[:, :n_features].mean(axis=0)
+        # Frequencies of selection, float32 is more than enough for ratios of bootstrap counts
+        scores = (counts / len(bootstrap_indices)).astype(np.float32)
+        self.stabl_scores_ = scores[:n_features]
+        if self.artificial_type is not None:
+            self.stabl_scores_artificial_ = scores[n_features:]
 
+        # Maximum score of every feature, original and artificial, in one reduction
+        max_scores = scores.max(axis=1)
+        self.max_scores_ = max_scores[:n_features]
         if self.artificial_type is not None:
-            self._compute_FDRc()
+            self.max_scores_artificial_ = max_scores[n_features:]
+            self._compute_FDRc(max_scores=self.max_scores_, max_scores_artificial=self.max_scores_artificial_)
 
         return self
 
@@ -941,8 +1444,9 @@ class Stabl(SelectorMixin, BaseEstimator):
         else:
             final_cutoff = new_threshold
 
-        max_scores = np.max(self.stabl_scores_, axis=1)
-        mask = max_scores > final_cutoff
+        max_scores = self.max_scores_
+        # Cutoff compared in the precision of the scores, so that ties (e.g. 0.55 and 11/20) stay ties
+        mask = max_scores > np.asarray(final_cutoff, dtype=max_scores.dtype)
         return mask
 
     def _make_artificial_features(self, X, artificial_type, nb_noise, random_state=None):
@@ -970,17 +1474,18 @@ class Stabl(SelectorMixin, BaseEstimator):
         rng = np.random.default_rng(seed=random_state)
 
         if artificial_type == "random_permutation":
-            X_artificial = X.copy()
-            indices = rng.choice(a=X_artificial.shape[1], size=nb_noise, replace=False)
-            X_artificial = X_artificial[:, indices]
-
-            for i in range(X_artificial.shape[1]):
-                rng.shuffle(X_artificial[:, i])
+            indices = rng.choice(a=X.shape[1], size=nb_noise, replace=False)
+            # Only the selected columns are copied, then each one is shuffled independently, in place
+            X_artificial = X[:, indices]
+            rng.permuted(X_artificial, axis=0, out=X_artificial)
 
         elif artificial_type == "knockoff":
-            X_artificial = GaussianSampler(X, method='equicorrelated').sample_knockoffs()
-            indices = rng.choice(a=X_artificial.shape[1], size=nb_noise, replace=False)
-            X_artificial = X_artificial[:, indices]
+            # Only the knockoffs of the retained columns are sampled. The sampling is done once per fit, shared
+            # by all the bootstraps, and its linear algebra runs on the (multithreaded) BLAS thread pool, bounded
+            # by the caller's threadpool limits (see multi_omic_pipelines._run_fold_limited)
+            indices = rng.choice(a=X.shape[1], size=nb_noise, replace=False)
+            # Copied: the cached knockoffs are read-only and shared with the other estimators
+            X_artificial = _gaussian_knockoffs(X, columns=indices, rng=rng, random_state=random_state).copy()
 
         else:
             raise ValueError("The type of artificial feature must be in ['random_permutation', 'knockoff']."
@@ -988,23 +1493,34 @@ class Stabl(SelectorMixin, BaseEstimator):
 
         self.X_artificial_ = X_artificial
 
-        return np.concatenate([X, X_artificial], axis=1)
+        # Filled in a preallocated array rather than with np.concatenate, so the allocation is explicit
+        n_features = X.shape[1]
+        X_out = np.empty((X.shape[0], n_features + nb_noise), dtype=np.result_type(X, X_artificial))
+        X_out[:, :n_features] = X
+        X_out[:, n_features:] = X_artificial
+        return X_out
 
-    def _compute_FDRc(self):
+    def _compute_FDRc(self, max_scores, max_scores_artificial):
         """Function that computes the FDRc at each value of the `thresholds_grid`.
         Also compute the threshold minimizing the FDRc.
+
+        Parameters
+        ----------
+        max_scores: array, shape=(n_features, )
+            Maximum stability score of each original feature over the lambda grid.
+
+        max_scores_artificial: array, shape=(n_artificial_features, )
+            Maximum stability score of each artificial feature over the lambda grid.
         """
 
-        FDPs = []  # Initializing false discovery proportions
         artificial_proportion = self.artificial_proportion
-        max_scores_artificial = np.max(self.stabl_scores_artificial_, axis=1)
-        max_scores = np.max(self.stabl_scores_, axis=1)
-
-        for thresh in self.fdr_threshold_range:
-            num = np.sum((1 / artificial_proportion) * (max_scores_artificial > thresh)) + 1
-            denum = max([1, np.sum((max_scores > thresh))])
-            FDP = num / denum
-            FDPs.append(FDP)
+        thresholds = np.asarray(self.fdr_threshold_range, dtype=max_scores.dtype)
+
+        # False discovery proportions for all the thresholds at once. The number of scores above
+        # each threshold is read from the sorted scores, without a (n_features, n_thresholds) comparison
+        num = _count_above(max_scores_artificial, thresholds) / artificial_proportion + 1
+        denum = np.maximum(_count_above(max_scores, thresholds), 1)
+        FDPs = num / denum
 
         self.FDRs_ = FDPs
         self.min_fdr_ = np.min(FDPs)
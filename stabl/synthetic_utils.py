@@ -28,38 +28,35 @@ ridgecv = RidgeCV(alphas=np.logspace(-2, 2, 30), cv=5, scoring='r2')
 
 
 def compute_est_FDR(stability_selection):
-    FDPs = []  # Initializing false discovery proportions
-    thresholds_grid = np.arange(0., 1., 0.01)
     artificial_proportion = stability_selection.artificial_proportion
-    max_scores_artificial = np.max(stability_selection.stabl_scores_artificial_, axis=1)
-    max_scores = np.max(stability_selection.stabl_scores_, axis=1)
+    # Max scores stored at fit time
+    max_scores_artificial = stability_selection.max_scores_artificial_
+    max_scores = stability_selection.max_scores_
+    thresholds_grid = np.arange(0., 1., 0.01).astype(max_scores.dtype)
 
-    for thresh in thresholds_grid:
-        num = np.sum((1 / artificial_proportion) * (max_scores_artificial > thresh))
-        denum = np.max([1, np.sum((max_scores > thresh))])
-        FDP = (num + 1) / denum
-        FDPs.append(FDP)
+    # False discovery proportions for all the thresholds at once
+    num = (max_scores_artificial[:, None] > thresholds_grid).sum(axis=0) / artificial_proportion
+    denum = np.maximum((max_scores[:, None] > thresholds_grid).sum(axis=0), 1)
+    FDPs = (num + 1) / denum
 
-    return FDPs
+    return FDPs.tolist()
 
 
 def compute_true_FDR(stability_selection, true_features_indices):
-    max_scores = stability_selection.stabl_scores_.max(axis=1)
-    thresh_grid = np.arange(0, 1, 0.01)
-    FDRs = []
-    tFDRs = []
-    for thresh in thresh_grid:
-        set_selected_features = set(np.where(max_scores > thresh)[0])
-        if len(set_selected_features) == 0:
-            FDR = 1.
-            tFDR = 1.
-        else:
-            FP = len(set_selected_features - set(true_features_indices))
-            FDR = (FP + 1) / len(set_selected_features)
-            tFDR = FP / len(set_selected_features)
-        tFDRs.append(tFDR)
-        FDRs.append(FDR)
-    return FDRs, tFDRs
+    max_scores = stability_selection.max_scores_
+    thresh_grid = np.arange(0, 1, 0.01).astype(max_scores.dtype)
+
+    # Selected features and false positives for all the thresholds at once
+    selected = max_scores[:, None] > thresh_grid
+    is_false = np.ones(len(max_scores), dtype=bool)
+    is_false[list(true_features_indices)] = False
+    n_selected = selected.sum(axis=0)
+    FP = (selected & is_false[:, None]).sum(axis=0)
+
+    n_selected_safe = np.maximum(n_selected, 1)
+    FDRs = np.where(n_selected == 0, 1., (FP + 1) / n_selected_safe)
+    tFDRs = np.where(n_selected == 0, 1., FP / n_selected_safe)
+    return FDRs.tolist(), tFDRs.tolist()
 
 
 def make_train_test(n_features, n_informative, noise=2, s_u=2, sigma=1):